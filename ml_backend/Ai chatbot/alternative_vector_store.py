@@ -1,15 +1,37 @@
 """
 Alternate vector store implementation that doesn't rely on sentence-transformers.
 This uses scikit-learn's TfidfVectorizer which has fewer dependencies.
+
+TF-IDF vectors are kept as a sparse CSR matrix and queries are scored with
+sparse dot products (cosine similarity, since rows are L2-normalized), so
+memory and query cost scale with the number of non-zeros rather than
+vocabulary size x corpus size.
+
+Knowledge bases are saved in the memory-mapped format from kb_format; the
+vectorizer is stored as its vocabulary and IDF weights and only rebuilt
+when the first query arrives.
 """
 
 import numpy as np
 import os
 import pickle
-import faiss
 from typing import List, Dict, Any
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+from kb_format import (
+    DocumentSequence, StringTable, csr_nbytes, documents_nbytes, load_array,
+    load_csr, read_manifest, save_array, save_csr, write_documents, write_manifest
+)
+
+# TfidfVectorizer settings recorded in the manifest so the vectorizer can be
+# rebuilt from its vocabulary without unpickling it
+VECTORIZER_PARAMS = (
+    "lowercase", "stop_words", "max_features", "ngram_range", "analyzer",
+    "token_pattern", "strip_accents", "binary", "norm", "use_idf",
+    "smooth_idf", "sublinear_tf"
+)
+
 class AlternativeVectorStore:
     """A vector store implementation using TF-IDF from scikit-learn."""
     
@@ -21,9 +43,16 @@ class AlternativeVectorStore:
             max_features=5000,  # Limit features to avoid memory issues
             ngram_range=(1, 2)  # Use unigrams and bigrams for better context
         )
-        self.index = None
         self.documents = []
+        # Document-term matrix (CSR) and its transpose, term-document (CSR),
+        # which acts as an inverted index: each row is a term's postings list
         self.embeddings = None
+        self.term_index = None
+        # Saved vocabulary and IDF weights when loaded from disk; the
+        # vectorizer is rebuilt from them on first use
+        self._vocabulary = None
+        self._idf = None
+        self._vectorizer_params = None
         
     def add_documents(self, documents: List[Dict[str, Any]]):
         """
@@ -35,14 +64,38 @@ class AlternativeVectorStore:
         self.documents = documents
         texts = [doc["text"] for doc in documents]
         
-        # Create TF-IDF embeddings
-        embeddings_sparse = self.vectorizer.fit_transform(texts)
-        self.embeddings = embeddings_sparse.toarray().astype(np.float32)
+        # Create TF-IDF embeddings (sparse, L2-normalized rows)
+        self._set_embeddings(self.vectorizer.fit_transform(texts))
+    
+    def update_documents(self, keep: List[int], new_documents: List[Dict[str, Any]]):
+        """
+        Keep the documents at the given indices (in order) and append new ones
+        without refitting the vectorizer.
+        
+        New documents are embedded with the existing vocabulary and IDF
+        weights, so terms they introduce are ignored until the next full
+        add_documents re-weighting.
         
-        # Create FAISS index
-        dimension = self.embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(self.embeddings)
+        Args:
+            keep: Indices of existing documents to keep
+            new_documents: Documents to add after them
+        """
+        if self.vectorizer is None:
+            self._restore_vectorizer()
+        keep = np.asarray(keep, dtype=np.int64)
+        
+        parts = [self.embeddings[keep]]
+        if new_documents:
+            texts = [doc["text"] for doc in new_documents]
+            parts.append(self.vectorizer.transform(texts).astype(np.float32))
+        
+        self.documents = [self.documents[i] for i in keep] + list(new_documents)
+        self._set_embeddings(sparse.vstack(parts, format="csr"))
+    
+    def _set_embeddings(self, embeddings):
+        """Store the document-term matrix and build the inverted index from it"""
+        self.embeddings = sparse.csr_matrix(embeddings, dtype=np.float32)
+        self.term_index = self.embeddings.T.tocsr()
         
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
@@ -53,30 +106,63 @@ class AlternativeVectorStore:
             top_k: Number of top results to return
             
         Returns:
-            List of documents with similarity scores
+            List of documents with cosine similarity scores (higher is more similar)
         """
-        if self.index is None or not self.documents:
+        if self.embeddings is None or not self.documents:
             raise ValueError("No documents have been added to the vector store")
             
         # Create query embedding
-        query_embedding = self.vectorizer.transform([query]).toarray().astype(np.float32)
+        query_embedding = self.embed_query(query)
+        k = min(top_k, len(self.documents))
         
-        # Search index
-        distances, indices = self.index.search(
-            query_embedding, 
-            k=min(top_k, len(self.documents))
-        )
+        # Score only documents that share a term with the query: summing the
+        # query terms' postings rows gives a sparse 1 x num_documents result
+        scores = (query_embedding @ self.term_index).tocsr()
+        candidates, candidate_scores = scores.indices, scores.data
+        
+        if len(candidates) > k:
+            top = np.argpartition(-candidate_scores, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-candidate_scores[top], kind="stable")]
+        indices = list(candidates[top])
+        similarities = list(candidate_scores[top])
+        
+        # Fewer matching documents than requested: fill with zero-score
+        # documents in corpus order, as the dense index did
+        if len(indices) < k:
+            matched = set(indices)
+            for idx in range(len(self.documents)):
+                if len(indices) == k:
+                    break
+                if idx not in matched:
+                    indices.append(idx)
+                    similarities.append(0.0)
         
         results = []
-        for i, idx in enumerate(indices[0]):
+        for idx, score in zip(indices, similarities):
             results.append({
                 "text": self.documents[idx]["text"],
                 "metadata": self.documents[idx]["metadata"],
-                "score": float(distances[0][i])
+                "score": float(score)
             })
             
         return results
     
+    def embed_query(self, query: str) -> sparse.csr_matrix:
+        """
+        Embed a query into the TF-IDF space.
+        
+        Args:
+            query: Query text
+            
+        Returns:
+            L2-normalized 1 x vocabulary sparse vector
+        """
+        if self.vectorizer is None:
+            self._restore_vectorizer()
+        return self.vectorizer.transform([query]).astype(np.float32)
+    
     def save(self, directory: str):
         """
         Save the vector store to disk.
@@ -85,16 +171,38 @@ class AlternativeVectorStore:
             directory: Directory to save the vector store
         """
         os.makedirs(directory, exist_ok=True)
+        if self.vectorizer is None:
+            self._restore_vectorizer()
         
-        # Save the index
-        faiss.write_index(self.index, os.path.join(directory, "index.faiss"))
+        # Save documents, the sparse embeddings and the inverted index
+        write_documents(directory, self.documents)
+        save_csr(directory, "embeddings", self.embeddings)
+        save_csr(directory, "term_index", self.term_index)
         
-        # Save vectorizer and documents
-        with open(os.path.join(directory, "vector_store.pkl"), "wb") as f:
-            pickle.dump({
-                "documents": self.documents,
-                "vectorizer": self.vectorizer
-            }, f)
+        # Save the vectorizer as its vocabulary (ordered by feature index)
+        # and IDF weights
+        StringTable.write(directory, "vocabulary", self.vectorizer.get_feature_names_out())
+        save_array(directory, "idf", self.vectorizer.idf_.astype(np.float64))
+        
+        params = self.vectorizer.get_params()
+        write_manifest(
+            directory,
+            "tfidf",
+            vectorizer={name: params[name] for name in VECTORIZER_PARAMS}
+        )
+    
+    def _restore_vectorizer(self):
+        """Rebuild the fitted vectorizer from the saved vocabulary and IDF weights"""
+        params = dict(self._vectorizer_params)
+        params["ngram_range"] = tuple(params["ngram_range"])
+        vectorizer = TfidfVectorizer(**params)
+        vectorizer.vocabulary_ = {term: i for i, term in enumerate(self._vocabulary)}
+        vectorizer.idf_ = np.array(self._idf)
+        self.vectorizer = vectorizer
+    
+    def nbytes(self) -> int:
+        """Approximate size of the store's documents and index (mapped or in memory)"""
+        return documents_nbytes(self.documents) + csr_nbytes(self.embeddings) + csr_nbytes(self.term_index)
     
     # Required to match the interface of VectorStore
     def get_sentence_embedding_dimension(self):
@@ -114,7 +222,19 @@ class AlternativeVectorStore:
         Returns:
             Loaded AlternativeVectorStore instance
         """
-        # Load vectorizer and documents
+        manifest = read_manifest(directory)
+        if manifest is not None:
+            instance = cls()
+            instance.documents = DocumentSequence(directory)
+            instance.embeddings = load_csr(directory, "embeddings")
+            instance.term_index = load_csr(directory, "term_index")
+            instance.vectorizer = None
+            instance._vocabulary = StringTable.open(directory, "vocabulary")
+            instance._idf = load_array(directory, "idf")
+            instance._vectorizer_params = manifest["vectorizer"]
+            return instance
+        
+        # Legacy format: pickled vectorizer and documents
         with open(os.path.join(directory, "vector_store.pkl"), "rb") as f:
             data = pickle.load(f)
             
@@ -123,7 +243,13 @@ class AlternativeVectorStore:
         instance.documents = data["documents"]
         instance.vectorizer = data["vectorizer"]
         
-        # Load the index
-        instance.index = faiss.read_index(os.path.join(directory, "index.faiss"))
+        # Load the sparse embeddings; knowledge bases saved with the old
+        # dense FAISS index are re-embedded from their texts
+        embeddings_path = os.path.join(directory, "embeddings.npz")
+        if os.path.exists(embeddings_path):
+            instance._set_embeddings(sparse.load_npz(embeddings_path))
+        else:
+            texts = [doc["text"] for doc in instance.documents]
+            instance._set_embeddings(instance.vectorizer.transform(texts))
         
         return instance
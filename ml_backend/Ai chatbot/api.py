@@ -1,13 +1,15 @@
 import os
+import asyncio
 import tempfile
 import uuid
 import json
 from typing import List, Dict, Any, Optional
 from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 import logging
 from dotenv import load_dotenv
 
@@ -15,9 +17,17 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from pdf_processor import PDFProcessor
+from extraction_cache import ExtractionCache
 from alternative_vector_store import AlternativeVectorStore
-from rag_chain import RAGChain
-from chatbot_config import CHATBOT_NAME, CHATBOT_VERSION, CHATBOT_PURPOSE
+from bm25_store import BM25Store
+from kb_format import read_manifest
+from kb_jobs import JobQueue
+from kb_manager import KnowledgeBaseManager
+from kb_registry import KnowledgeBaseRegistry
+from kb_sources import build_sources, count_chunks, load_sources, plan_update, save_sources, scan_files
+from response_cache import SemanticCache, TTLCache, chunk_set, normalize_question, prompt_hash
+from rag_chain import RAGChain, StreamInterrupted, page_label
+from chatbot_config import CHATBOT_NAME, CHATBOT_VERSION, CHATBOT_PURPOSE, ERROR_RESPONSE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -44,21 +54,71 @@ DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 VECTOR_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vector_store")
 # Knowledge base info file
 KB_INFO_FILE = os.path.join(VECTOR_STORE_DIR, "kb_info.json")
+# Parsed kb_info.json, re-read only when the file changes (checked at most
+# every KB_INFO_CHECK_INTERVAL seconds)
+kb_registry = KnowledgeBaseRegistry(KB_INFO_FILE, check_interval=float(os.environ.get("KB_INFO_CHECK_INTERVAL", 1.0)))
+
+# Retriever backends a knowledge base can be built with (recorded per KB in kb_info.json)
+RETRIEVERS = {
+    "tfidf": AlternativeVectorStore,
+    "bm25": BM25Store
+}
+DEFAULT_RETRIEVER = os.environ.get("DEFAULT_RETRIEVER", "tfidf")
 
 # Create directories if they don't exist
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
 
 # Initialize components
-pdf_processor = PDFProcessor()
+# Extracted pages and chunks are cached on disk by file hash, so rebuilding
+# a knowledge base or changing chunk parameters skips re-extraction
+# (set EXTRACTION_CACHE_DIR to an empty string to disable)
+EXTRACTION_CACHE_DIR = os.environ.get(
+    "EXTRACTION_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "extraction_cache")
+)
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get("EXTRACTION_CACHE_MAX_BYTES", 1 << 30))
+extraction_cache = ExtractionCache(EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES) if EXTRACTION_CACHE_DIR else None
+
+# PDF pages are extracted by a process pool (PDF_WORKERS processes, default CPU count)
+pdf_processor = PDFProcessor(
+    max_workers=int(os.environ["PDF_WORKERS"]) if os.environ.get("PDF_WORKERS") else None,
+    cache=extraction_cache
+)
 vector_store = None
 rag_chain = None  # Will be initialized when API key is provided
 
+# Maximum number of LLM calls in flight per worker; further chats wait
+# their turn without blocking the event loop
+MAX_CONCURRENT_LLM_CALLS = int(os.environ.get("MAX_CONCURRENT_LLM_CALLS", 32))
+llm_semaphore = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
+
 # In-memory storage for chat sessions
 chat_sessions = {}
 
-# Store for knowledge bases
-knowledge_bases = {}
+# Caches for repeat questions: retrieval results by (kb_id, normalized
+# question, top_k) and LLM answers by (kb_id, model, prompt hash)
+CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", 3600))
+retrieval_cache = TTLCache(
+    max_size=int(os.environ.get("RETRIEVAL_CACHE_SIZE", 1024)),
+    ttl_seconds=CACHE_TTL_SECONDS
+)
+answer_cache = TTLCache(
+    max_size=int(os.environ.get("ANSWER_CACHE_SIZE", 1024)),
+    ttl_seconds=CACHE_TTL_SECONDS
+)
+# Answers for paraphrased questions that retrieve the same chunks
+semantic_cache = SemanticCache(
+    max_size=int(os.environ.get("SEMANTIC_CACHE_SIZE", 512)),
+    threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.75)),
+    ttl_seconds=CACHE_TTL_SECONDS
+)
+
+# Function to drop cached results for a knowledge base that was rebuilt or replaced
+def invalidate_kb_caches(kb_id):
+    retrieval_cache.invalidate(kb_id)
+    answer_cache.invalidate(kb_id)
+    semantic_cache.invalidate(kb_id)
 
 # Models
 class ApiKeyRequest(BaseModel):
@@ -81,37 +141,96 @@ class ProcessDataResponse(BaseModel):
     num_documents: int = Field(..., description="Number of documents processed")
     files_processed: List[str] = Field(..., description="List of processed files")
 
-# Function to load knowledge base information
+class JobResponse(BaseModel):
+    job_id: str = Field(..., description="Knowledge base job ID")
+    status: str = Field(..., description="Job status: queued, running, completed or failed")
+    status_url: str = Field(..., description="URL to poll for progress and the result")
+
+# Function to load knowledge base information (a copy that may be modified)
 def load_kb_info():
-    if os.path.exists(KB_INFO_FILE):
-        with open(KB_INFO_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+    return kb_registry.load()
 
 # Function to save knowledge base information
 def save_kb_info(kb_info):
-    with open(KB_INFO_FILE, 'w') as f:
-        json.dump(kb_info, f)
+    kb_registry.save(kb_info)
 
-# Function to load knowledge bases on startup
-def load_knowledge_bases():
-    global knowledge_bases
-    
-    kb_info = load_kb_info()
-    logger.info(f"Found {len(kb_info)} knowledge bases in storage")
-    
-    for kb_id, kb_data in kb_info.items():
-        try:
-            kb_dir = os.path.join(VECTOR_STORE_DIR, kb_id)
-            if os.path.exists(kb_dir):
-                logger.info(f"Loading knowledge base {kb_id}")
-                knowledge_bases[kb_id] = AlternativeVectorStore.load(kb_dir)
-                logger.info(f"Loaded knowledge base {kb_id} with {len(knowledge_bases[kb_id].documents)} documents")
-        except Exception as e:
-            logger.error(f"Error loading knowledge base {kb_id}: {str(e)}")
-
-# Load knowledge bases on startup
-load_knowledge_bases()
+# Function to look up the retriever class for a KB, checking the name is known
+def get_retriever_class(retriever: str):
+    if retriever not in RETRIEVERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown retriever '{retriever}'. Available: {', '.join(RETRIEVERS)}"
+        )
+    return RETRIEVERS[retriever]
+
+# Function to load a saved knowledge base with the retriever it was built with
+def load_vector_store(kb_id, kb_data=None):
+    kb_dir = os.path.join(VECTOR_STORE_DIR, kb_id)
+    manifest = read_manifest(kb_dir)
+    if manifest is not None:
+        retriever = manifest["retriever"]
+    else:
+        # Legacy pickled KBs predate selectable retrievers and are TF-IDF
+        retriever = (kb_data or {}).get("retriever", "tfidf")
+    return RETRIEVERS[retriever].load(kb_dir)
+
+# Function to check that a KB ID names a knowledge base directory, so a
+# client-supplied ID cannot reach other paths or half-built .tmp directories
+def is_valid_kb_id(kb_id):
+    return (
+        bool(kb_id)
+        and kb_id != "default_kb_id"
+        and not kb_id.startswith(".")
+        and ".." not in kb_id
+        and os.sep not in kb_id
+        and (os.altsep is None or os.altsep not in kb_id)
+    )
+
+# Function to load a knowledge base on first use; returns None if it is not available.
+# Only knowledge bases recorded in kb_info.json are loaded
+def load_knowledge_base(kb_id):
+    if not is_valid_kb_id(kb_id):
+        logger.warning(f"Rejected invalid knowledge base ID {kb_id!r}")
+        return None
+    if kb_registry.get(kb_id) is None and kb_id != kb_registry.default_kb_id():
+        return None
+    kb_dir = os.path.join(VECTOR_STORE_DIR, kb_id)
+    if not os.path.isdir(kb_dir):
+        return None
+    try:
+        logger.info(f"Loading knowledge base {kb_id}")
+        kb = load_vector_store(kb_id, kb_registry.get(kb_id))
+        logger.info(f"Loaded knowledge base {kb_id} with {len(kb.documents)} documents")
+        return kb
+    except Exception as e:
+        logger.error(f"Error loading knowledge base {kb_id}: {str(e)}")
+        return None
+
+# Knowledge bases are loaded on first request and evicted least recently used
+# first once more than KB_CACHE_MAX_KBS (or KB_CACHE_MAX_BYTES) are resident.
+# Unknown KB IDs are answered from memory for KB_NEGATIVE_CACHE_SECONDS
+kb_manager = KnowledgeBaseManager(
+    load_knowledge_base,
+    max_kbs=int(os.environ.get("KB_CACHE_MAX_KBS", 4)),
+    max_bytes=int(os.environ["KB_CACHE_MAX_BYTES"]) if os.environ.get("KB_CACHE_MAX_BYTES") else None,
+    negative_ttl=float(os.environ.get("KB_NEGATIVE_CACHE_SECONDS", 30))
+)
+
+# Incremental updates after which /api/update-knowledge-base rebuilds the
+# index from all chunks to refresh IDF weights
+KB_REWEIGHT_INTERVAL = int(os.environ.get("KB_REWEIGHT_INTERVAL", 10))
+
+# Function to build the source manifest for a KB built from all current files
+def full_build_sources(current, documents):
+    counts = count_chunks(documents)
+    return build_sources([
+        (key, entry, counts.get(entry["path"], 0))
+        for key, entry in current.items()
+    ])
+
+def file_hashes(current):
+    """Path -> SHA-256 of the scanned files, for the extraction cache"""
+    return {entry["path"]: entry["sha256"] for entry in current.values()}
 
 # API endpoint to set Groq API key
 @app.post("/api/set-api-key", response_model=dict)
@@ -132,30 +251,80 @@ def get_rag_chain():
         )
     return rag_chain
 
-# API endpoint to process PDF files from data directory
-@app.post("/api/process-knowledge-base", response_model=ProcessDataResponse)
-async def process_knowledge_base(force_reprocess: bool = False):
+# Knowledge base builds run as background jobs so PDF extraction and indexing
+# never block the event loop. KB_BUILD_WORKERS builds run at a time (default
+# 1, so builds that replace the default KB run one after another)
+kb_jobs = JobQueue(max_workers=int(os.environ.get("KB_BUILD_WORKERS", 1)))
+
+@app.on_event("shutdown")
+def shutdown_kb_jobs():
+    kb_jobs.shutdown(wait=False)
+
+# Function to find all PDF files in the data directory
+def find_pdf_files():
+    pdf_paths = []
+    for root, _, files in os.walk(DATA_DIR):
+        for file in files:
+            if file.lower().endswith(".pdf"):
+                pdf_paths.append(os.path.join(root, file))
+    return pdf_paths
+
+# Function to save a new KB under a temporary name and rename it into place,
+# so a KB directory is never seen half written
+def save_new_knowledge_base(kb_vector_store, sources):
+    kb_id = str(uuid.uuid4())
+    tmp_dir = os.path.join(VECTOR_STORE_DIR, f".{kb_id}.tmp")
+    kb_vector_store.save(tmp_dir)
+    save_sources(tmp_dir, sources)
+    os.replace(tmp_dir, os.path.join(VECTOR_STORE_DIR, kb_id))
+    return kb_id
+
+# Function to make a saved KB the default; chats see either the previous or
+# the new default, never a partially built one
+def publish_knowledge_base(kb_id, kb_vector_store, kb_data):
+    kb_manager.put(kb_id, kb_vector_store)
+    
+    def set_default(kb_info):
+        previous_kb_id = kb_info.get("default_kb_id")
+        kb_info[kb_id] = kb_data
+        kb_info["default_kb_id"] = kb_id
+        return previous_kb_id
+    
+    previous_kb_id = kb_registry.update(set_default)
+    
+    # The superseded KB is reloaded from disk if it is still requested by ID,
+    # and answers cached for it are stale
+    if previous_kb_id and previous_kb_id != kb_id:
+        kb_manager.evict(previous_kb_id)
+        invalidate_kb_caches(previous_kb_id)
+
+def job_response(job):
+    return JobResponse(job_id=job.id, status=job.status, status_url=f"/api/jobs/{job.id}")
+
+# Job that processes PDF files from the data directory into a new default KB
+def build_knowledge_base(job, force_reprocess, retriever):
+    retriever_class = RETRIEVERS[retriever]
     try:
         # Check if we already have a processed knowledge base
         kb_info = load_kb_info()
         default_kb_id = kb_info.get("default_kb_id")
         
         # If we have a default KB and not forcing reprocess, just return it
-        if default_kb_id and default_kb_id in knowledge_bases and not force_reprocess:
-            kb = knowledge_bases[default_kb_id]
+        kb = kb_manager.get(default_kb_id) if default_kb_id and not force_reprocess else None
+        if kb is not None:
             return ProcessDataResponse(
                 message="Using existing knowledge base",
                 kb_id=default_kb_id,
                 num_documents=len(kb.documents),
                 files_processed=[doc["metadata"].get("source", "Unknown") for doc in kb.documents]
-            )
+            ).model_dump()
         
         # For Vercel deployment, check if DATA_DIR exists first
         if not os.path.exists(DATA_DIR):
             # If we're on Vercel, we might not have the data directory but still have the vector store
             # Check if we have any pre-processed knowledge bases available
             kb_dirs = [d for d in os.listdir(VECTOR_STORE_DIR) 
-                      if os.path.isdir(os.path.join(VECTOR_STORE_DIR, d)) and d != "__pycache__"]
+                      if os.path.isdir(os.path.join(VECTOR_STORE_DIR, d)) and d != "__pycache__" and not d.startswith(".")]
             
             if kb_dirs:
                 # Use the most recent pre-processed knowledge base
@@ -163,13 +332,12 @@ async def process_knowledge_base(force_reprocess: bool = False):
                 kb_path = os.path.join(VECTOR_STORE_DIR, kb_id)
                 
                 # Load the vector store
-                kb_vector_store = AlternativeVectorStore.load(kb_path)
-                knowledge_bases[kb_id] = kb_vector_store
+                kb_vector_store = load_vector_store(kb_id, kb_info.get(kb_id))
+                kb_manager.put(kb_id, kb_vector_store)
+                invalidate_kb_caches(kb_id)
                 
                 # Update KB info
-                kb_info = load_kb_info()
-                kb_info["default_kb_id"] = kb_id
-                save_kb_info(kb_info)
+                kb_registry.update(lambda kb_info: kb_info.update(default_kb_id=kb_id))
                 
                 logger.info(f"Loaded pre-processed knowledge base {kb_id} from {kb_path}")
                 
@@ -178,7 +346,7 @@ async def process_knowledge_base(force_reprocess: bool = False):
                     kb_id=kb_id,
                     num_documents=len(kb_vector_store.documents),
                     files_processed=["pre-processed"]
-                )
+                ).model_dump()
             else:
                 raise HTTPException(
                     status_code=404, 
@@ -186,57 +354,48 @@ async def process_knowledge_base(force_reprocess: bool = False):
                 )
                 
         # Find all PDF files in the data directory
-        pdf_paths = []
-        for root, _, files in os.walk(DATA_DIR):
-            for file in files:
-                if file.lower().endswith(".pdf"):
-                    pdf_paths.append(os.path.join(root, file))
-        
+        pdf_paths = find_pdf_files()
         if not pdf_paths:
             raise HTTPException(status_code=404, detail=f"No PDF files found in {DATA_DIR}")
         
         # Process PDFs
         logger.info(f"Processing {len(pdf_paths)} PDF files")
-        documents = pdf_processor.process_multiple_pdfs(pdf_paths)
+        job.set_stage("scanning", files_total=len(pdf_paths))
+        current_files = scan_files(pdf_paths, DATA_DIR)
+        job.set_stage("extracting")
+        documents = pdf_processor.process_multiple_pdfs(pdf_paths, file_hashes(current_files), job.file_done)
         logger.info(f"Created {len(documents)} document chunks")
         
         # Create a new vector store for this knowledge base
-        kb_vector_store = AlternativeVectorStore()
+        job.set_stage("indexing")
+        kb_vector_store = retriever_class()
         kb_vector_store.add_documents(documents)
         
-        # Generate a unique ID for this knowledge base
-        kb_id = str(uuid.uuid4())
-        knowledge_bases[kb_id] = kb_vector_store
-        
-        # Save the vector store to disk
-        kb_dir = os.path.join(VECTOR_STORE_DIR, kb_id)
-        kb_vector_store.save(kb_dir)
-        logger.info(f"Saved knowledge base {kb_id} to {kb_dir}")
-        
-        # Update KB info
-        kb_info = load_kb_info()
-        kb_info[kb_id] = {
+        # Save the vector store to disk and swap it in as the default
+        job.set_stage("saving")
+        kb_id = save_new_knowledge_base(kb_vector_store, full_build_sources(current_files, documents))
+        logger.info(f"Saved knowledge base {kb_id}")
+        publish_knowledge_base(kb_id, kb_vector_store, {
             "created_at": str(uuid.uuid1()),
             "num_documents": len(documents),
-            "files": [os.path.basename(path) for path in pdf_paths]
-        }
-        kb_info["default_kb_id"] = kb_id
-        save_kb_info(kb_info)
+            "files": [os.path.basename(path) for path in pdf_paths],
+            "retriever": retriever
+        })
         
         return ProcessDataResponse(
             message="Knowledge base created and saved successfully",
             kb_id=kb_id,
             num_documents=len(documents),
             files_processed=[os.path.basename(path) for path in pdf_paths]
-        )
+        ).model_dump()
         
     except Exception as e:
         logger.error(f"Error processing PDFs: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing PDFs: {str(e)}")
 
-# API endpoint to update knowledge base with new PDFs
-@app.post("/api/update-knowledge-base", response_model=ProcessDataResponse)
-async def update_knowledge_base():
+# Job that updates the default KB with new, changed and removed PDFs
+def update_knowledge_base_files(job, retriever, full_rebuild):
+    retriever_class = RETRIEVERS[retriever]
     try:
         # For Vercel deployment, check if DATA_DIR exists first
         if not os.path.exists(DATA_DIR):
@@ -246,121 +405,315 @@ async def update_knowledge_base():
             )
             
         # Find all PDF files in the data directory
-        pdf_paths = []
-        for root, _, files in os.walk(DATA_DIR):
-            for file in files:
-                if file.lower().endswith(".pdf"):
-                    pdf_paths.append(os.path.join(root, file))
-        
+        pdf_paths = find_pdf_files()
         if not pdf_paths:
             raise HTTPException(status_code=404, detail=f"No PDF files found in {DATA_DIR}")
         
-        # Process PDFs
-        logger.info(f"Processing {len(pdf_paths)} PDF files for update")
-        documents = pdf_processor.process_multiple_pdfs(pdf_paths)
-        logger.info(f"Created {len(documents)} document chunks")
+        # Find the current default KB and the files it was built from
+        job.set_stage("scanning")
+        kb_info = load_kb_info()
+        previous_kb_id = kb_info.get("default_kb_id")
+        previous_dir = os.path.join(VECTOR_STORE_DIR, previous_kb_id) if previous_kb_id else None
+        sources = load_sources(previous_dir) if previous_dir and os.path.isdir(previous_dir) else None
+        current_files = scan_files(pdf_paths, DATA_DIR, sources)
         
-        # Create a new vector store
-        kb_vector_store = AlternativeVectorStore()
-        kb_vector_store.add_documents(documents)
+        # Only extract files that are new or changed since the last build,
+        # unless the KB predates source manifests or uses another retriever
+        incremental = (
+            not full_rebuild
+            and sources is not None
+            and kb_info.get(previous_kb_id, {}).get("retriever", "tfidf") == retriever
+        )
+        if incremental:
+            unchanged, changed, removed = plan_update(sources, current_files)
+            if not changed and not removed:
+                previous_kb = kb_manager.get(previous_kb_id)
+                if previous_kb is not None:
+                    return ProcessDataResponse(
+                        message="Knowledge base is up to date",
+                        kb_id=previous_kb_id,
+                        num_documents=len(previous_kb.documents),
+                        files_processed=[]
+                    ).model_dump()
+        else:
+            unchanged, changed, removed = [], list(current_files), []
         
-        # Generate a unique ID for this knowledge base
-        kb_id = str(uuid.uuid4())
-        knowledge_bases[kb_id] = kb_vector_store
+        changed_paths = [current_files[key]["path"] for key in changed]
+        logger.info(
+            f"Updating knowledge base: {len(changed)} new or changed, {len(unchanged)} unchanged "
+            f"and {len(removed)} removed PDF files"
+        )
+        job.set_stage("extracting", files_total=len(changed_paths))
+        new_documents = pdf_processor.process_multiple_pdfs(changed_paths, file_hashes(current_files), job.file_done)
+        logger.info(f"Created {len(new_documents)} document chunks")
         
-        # Save the vector store to disk
-        kb_dir = os.path.join(VECTOR_STORE_DIR, kb_id)
-        kb_vector_store.save(kb_dir)
-        logger.info(f"Saved updated knowledge base {kb_id} to {kb_dir}")
+        # Manifest for the updated KB: kept chunks first, then the new files
+        counts = count_chunks(new_documents)
+        files = [(key, current_files[key], len(sources["files"][key]["chunk_ids"])) for key in unchanged]
+        files += [(key, current_files[key], counts.get(current_files[key]["path"], 0)) for key in changed]
         
-        # Update KB info
-        kb_info = load_kb_info()
-        kb_info[kb_id] = {
+        job.set_stage("indexing")
+        if incremental:
+            # Start from a fresh copy of the current KB so chats on it are unaffected
+            keep = [i for key in unchanged for i in sources["files"][key]["chunk_ids"]]
+            kb_vector_store = load_vector_store(previous_kb_id, kb_info.get(previous_kb_id))
+            updates_since_reweight = sources.get("updates_since_reweight", 0) + 1
+            
+            if updates_since_reweight >= KB_REWEIGHT_INTERVAL:
+                # Periodic full re-weighting from the stored chunks (no re-extraction)
+                logger.info("Re-weighting the knowledge base index")
+                documents = [kb_vector_store.documents[i] for i in keep] + new_documents
+                kb_vector_store = retriever_class()
+                kb_vector_store.add_documents(documents)
+                updates_since_reweight = 0
+            else:
+                kb_vector_store.update_documents(keep, new_documents)
+        else:
+            kb_vector_store = retriever_class()
+            kb_vector_store.add_documents(new_documents)
+            updates_since_reweight = 0
+        
+        documents = kb_vector_store.documents
+        
+        # Save the vector store to disk and swap it in as the default
+        job.set_stage("saving")
+        kb_id = save_new_knowledge_base(kb_vector_store, build_sources(files, updates_since_reweight))
+        logger.info(f"Saved updated knowledge base {kb_id}")
+        publish_knowledge_base(kb_id, kb_vector_store, {
             "created_at": str(uuid.uuid1()),
             "num_documents": len(documents),
-            "files": [os.path.basename(path) for path in pdf_paths]
-        }
-        kb_info["default_kb_id"] = kb_id
-        save_kb_info(kb_info)
+            "files": [os.path.basename(path) for path in pdf_paths],
+            "retriever": retriever
+        })
         
         return ProcessDataResponse(
             message="Knowledge base updated and saved successfully",
             kb_id=kb_id,
             num_documents=len(documents),
-            files_processed=[os.path.basename(path) for path in pdf_paths]
-        )
+            files_processed=[os.path.basename(path) for path in changed_paths]
+        ).model_dump()
         
     except Exception as e:
         logger.error(f"Error updating knowledge base: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error updating knowledge base: {str(e)}")
 
-# API endpoint for chat
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat(
-    request: ChatRequest,
-    rag_chain: RAGChain = Depends(get_rag_chain),
-    x_kb_id: Optional[str] = Header(None, description="Knowledge base ID")
-):
+# API endpoint to process PDF files from data directory in the background
+@app.post("/api/process-knowledge-base", response_model=JobResponse, status_code=202)
+async def process_knowledge_base(force_reprocess: bool = False, retriever: str = DEFAULT_RETRIEVER):
+    get_retriever_class(retriever)
+    job = kb_jobs.submit(
+        "process",
+        {"force_reprocess": force_reprocess, "retriever": retriever},
+        lambda job: build_knowledge_base(job, force_reprocess, retriever)
+    )
+    return job_response(job)
+
+# API endpoint to update knowledge base with new PDFs in the background
+@app.post("/api/update-knowledge-base", response_model=JobResponse, status_code=202)
+async def update_knowledge_base(retriever: Optional[str] = None, full_rebuild: bool = False):
+    # Keep the current default KB's retriever unless another one is requested
+    if retriever is None:
+        kb_info = load_kb_info()
+        retriever = kb_info.get(kb_info.get("default_kb_id"), {}).get("retriever", DEFAULT_RETRIEVER)
+    get_retriever_class(retriever)
+    job = kb_jobs.submit(
+        "update",
+        {"retriever": retriever, "full_rebuild": full_rebuild},
+        lambda job: update_knowledge_base_files(job, retriever, full_rebuild)
+    )
+    return job_response(job)
+
+# API endpoint for the status, progress and result of a knowledge base job
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = kb_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+# API endpoint listing recent knowledge base jobs, newest first
+@app.get("/api/jobs")
+async def list_jobs():
+    return {"jobs": [job.to_dict() for job in kb_jobs.list()]}
+
+# Helper to resolve the knowledge base for a chat request
+def get_chat_knowledge_base(x_kb_id: Optional[str]):
     # If no KB ID is provided, use the default KB
     kb_id = x_kb_id
     if not kb_id:
-        kb_info = load_kb_info()
-        kb_id = kb_info.get("default_kb_id")
-    
-    if not kb_id or kb_id not in knowledge_bases:
-        # Try to load knowledge bases again
-        load_knowledge_bases()
-        
-        # Check again
-        if not kb_id or kb_id not in knowledge_bases:
-            raise HTTPException(
-                status_code=404, 
-                detail="Knowledge base not found. Please process PDFs first using /api/process-knowledge-base"
-            )
-    
-    # Get the knowledge base
-    kb_vector_store = knowledge_bases[kb_id]
-    
-    # Create a new session if none exists
-    session_id = request.session_id or str(uuid.uuid4())
+        kb_id = kb_registry.default_kb_id()
     
-    # Retrieve relevant documents
-    relevant_docs = kb_vector_store.search(request.question, top_k=request.top_k)
+    # Get the knowledge base, loading it on first use
+    kb_vector_store = kb_manager.get(kb_id) if is_valid_kb_id(kb_id) else None
+    if kb_vector_store is None:
+        raise HTTPException(
+            status_code=404, 
+            detail="Knowledge base not found. Please process PDFs first using /api/process-knowledge-base"
+        )
+    return kb_id, kb_vector_store
+
+# Helper to retrieve relevant documents through the retrieval cache
+def retrieve_documents(kb_id, kb_vector_store, question, top_k):
+    retrieval_key = (kb_id, normalize_question(question), top_k)
+    relevant_docs = retrieval_cache.get(retrieval_key)
+    if relevant_docs is None:
+        relevant_docs = kb_vector_store.search(question, top_k=top_k)
+        retrieval_cache.put(retrieval_key, relevant_docs)
+    return relevant_docs
+
+class AnswerLookup:
+    """Cache keys for a question's answer, and the cached answer if there is one"""
     
-    # Answer the question
-    answer = rag_chain.answer_question(request.question, relevant_docs)
+    def __init__(self, kb_id, kb_vector_store, rag_chain, question, relevant_docs):
+        self.kb_id = kb_id
+        self.model_name = rag_chain.model_name
+        self.answer_key = (kb_id, self.model_name, prompt_hash(rag_chain.build_prompt(question, relevant_docs)))
+        self.query_vector = None
+        self.chunks = None
+        
+        # Reuse the answer to an identical prompt
+        self.answer = answer_cache.get(self.answer_key)
+        if self.answer is None and hasattr(kb_vector_store, "embed_query"):
+            # Fall back to the answer for a similar question with the same chunks
+            self.query_vector = kb_vector_store.embed_query(question)
+            self.chunks = chunk_set(relevant_docs)
+            self.answer = semantic_cache.get(kb_id, self.model_name, self.query_vector, self.chunks)
+            if self.answer is not None:
+                answer_cache.put(self.answer_key, self.answer)
     
-    # Update the session with the conversation
+    def store(self, answer):
+        """Cache a freshly generated answer"""
+        # Don't cache failures so the next request retries the LLM
+        if answer == ERROR_RESPONSE:
+            return
+        answer_cache.put(self.answer_key, answer)
+        if self.query_vector is not None:
+            semantic_cache.put(self.kb_id, self.model_name, self.query_vector, self.chunks, answer)
+
+# Helper to record a question and answer in the chat session
+def record_chat_turn(session_id, question, answer, relevant_docs):
     if session_id not in chat_sessions:
         chat_sessions[session_id] = []
         
     chat_sessions[session_id].append({
-        "question": request.question,
+        "question": question,
         "answer": answer,
         "sources": [doc["metadata"] for doc in relevant_docs]
     })
-    
-    # Format sources for the response
-    sources = [
+
+# Helper to format sources for the response
+def format_sources(relevant_docs):
+    return [
         {
             "source": doc["metadata"].get("source", "Unknown"),
+            "page": page_label(doc["metadata"]),
             "score": doc["score"]
         }
         for doc in relevant_docs
     ]
+
+# Helper to format a Server-Sent Event
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# API endpoint for chat
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest,
+    rag_chain: RAGChain = Depends(get_rag_chain),
+    x_kb_id: Optional[str] = Header(None, description="Knowledge base ID")
+):
+    # Loading a KB, searching and embedding are CPU/disk work, so they run in
+    # the threadpool to keep the event loop free for other conversations
+    kb_id, kb_vector_store = await run_in_threadpool(get_chat_knowledge_base, x_kb_id)
+    
+    # Create a new session if none exists
+    session_id = request.session_id or str(uuid.uuid4())
+    
+    # Retrieve relevant documents
+    relevant_docs = await run_in_threadpool(
+        retrieve_documents, kb_id, kb_vector_store, request.question, request.top_k
+    )
+    
+    # Answer the question
+    lookup = await run_in_threadpool(
+        AnswerLookup, kb_id, kb_vector_store, rag_chain, request.question, relevant_docs
+    )
+    answer = lookup.answer
+    if answer is None:
+        async with llm_semaphore:
+            answer = await rag_chain.aanswer_question(request.question, relevant_docs)
+        lookup.store(answer)
+    
+    # Update the session with the conversation
+    record_chat_turn(session_id, request.question, answer, relevant_docs)
     
     return ChatResponse(
         answer=answer,
         session_id=session_id,
-        sources=sources
+        sources=format_sources(relevant_docs)
+    )
+
+# API endpoint for chat that streams the answer as Server-Sent Events:
+# a "sources" event first, then "token" events as the LLM generates, then "done"
+@app.post("/api/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    rag_chain: RAGChain = Depends(get_rag_chain),
+    x_kb_id: Optional[str] = Header(None, description="Knowledge base ID")
+):
+    kb_id, kb_vector_store = await run_in_threadpool(get_chat_knowledge_base, x_kb_id)
+    session_id = request.session_id or str(uuid.uuid4())
+    relevant_docs = await run_in_threadpool(
+        retrieve_documents, kb_id, kb_vector_store, request.question, request.top_k
+    )
+    lookup = await run_in_threadpool(
+        AnswerLookup, kb_id, kb_vector_store, rag_chain, request.question, relevant_docs
+    )
+    
+    async def events():
+        yield sse_event("sources", {"session_id": session_id, "sources": format_sources(relevant_docs)})
+        
+        if lookup.answer is not None:
+            # Cached answers are sent in one piece
+            answer = lookup.answer
+            yield sse_event("token", {"text": answer})
+        else:
+            parts = []
+            try:
+                async with llm_semaphore:
+                    async for token in rag_chain.astream_answer(request.question, relevant_docs):
+                        parts.append(token)
+                        yield sse_event("token", {"text": token})
+            except StreamInterrupted:
+                # The answer is truncated: don't cache or record it, and tell
+                # the client instead of sending done
+                yield sse_event("error", {"session_id": session_id, "detail": ERROR_RESPONSE.strip()})
+                return
+            answer = "".join(parts)
+            lookup.store(answer)
+        
+        record_chat_turn(session_id, request.question, answer, relevant_docs)
+        yield sse_event("done", {"session_id": session_id})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 # Health check endpoint
 @app.get("/api/health")
 async def health_check():
-    kb_info = load_kb_info()
-    default_kb_id = kb_info.get("default_kb_id")
-    kb_loaded = default_kb_id in knowledge_bases if default_kb_id else False
+    default_kb_id = kb_registry.default_kb_id()
+    # Knowledge bases are loaded lazily, so one that is on disk but not yet
+    # resident is reported as available
+    if default_kb_id and default_kb_id in kb_manager:
+        kb_status = "loaded"
+    elif default_kb_id and os.path.isdir(os.path.join(VECTOR_STORE_DIR, default_kb_id)):
+        kb_status = "available"
+    else:
+        kb_status = "not_loaded"
     
     # Get RAG chain to access chatbot info if available
     try:
@@ -376,7 +729,7 @@ async def health_check():
     return {
         "status": "ok", 
         "version": app.version,
-        "kb_status": "loaded" if kb_loaded else "not_loaded",
+        "kb_status": kb_status,
         "chatbot": chatbot_info
     }
 
@@ -390,15 +743,32 @@ async def get_knowledge_bases():
         "knowledge_bases": [
             {
                 "id": kb_id, 
-                "num_documents": len(kb) if kb_id in knowledge_bases else 0,
+                "num_documents": kb_data.get("num_documents", 0),
                 "is_default": kb_id == default_kb_id,
-                "info": kb_info.get(kb_id, {})
+                "resident": kb_id in kb_manager,
+                "info": kb_data
             }
-            for kb_id, kb in knowledge_bases.items()
+            for kb_id, kb_data in kb_info.items()
+            if kb_id != "default_kb_id"
         ],
         "default_kb_id": default_kb_id
     }
 
+# Hit/miss counters for the retrieval, answer and extraction caches
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return {
+        "retrieval": retrieval_cache.stats(),
+        "answer": answer_cache.stats(),
+        "semantic": semantic_cache.stats(),
+        "extraction": extraction_cache.stats() if extraction_cache is not None else None
+    }
+
+# Resident knowledge bases and load/eviction counters
+@app.get("/api/knowledge-bases/stats")
+async def get_knowledge_base_stats():
+    return kb_manager.stats()
+
 # List all PDF files in the data directory
 @app.get("/api/list-pdf-files")
 async def list_pdf_files():
@@ -427,10 +797,20 @@ async def root():
             "/api/health", 
             "/api/set-api-key",
             "/api/chat",
+            "/api/chat/stream",
             "/api/process-knowledge-base",
+            "/api/update-knowledge-base",
+            "/api/jobs",
+            "/api/jobs/{job_id}",
             "/api/knowledge-bases",
+            "/api/knowledge-bases/stats",
+            "/api/cache/stats",
             "/api/list-pdf-files"
-        ]
+        ],
+        "knowledge_base_jobs": (
+            "/api/process-knowledge-base and /api/update-knowledge-base run in the background: "
+            "they return 202 with a job whose status_url (/api/jobs/{job_id}) reports progress and the result"
+        )
     }
 
 if __name__ == "__main__":
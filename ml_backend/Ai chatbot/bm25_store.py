@@ -0,0 +1,340 @@
+"""
+BM25 retriever built on a native inverted index.
+
+No embedding model is needed: each term has a postings list of
+(document, precomputed BM25 weight) pairs, and queries are scored
+term-at-a-time with MaxScore-style early termination.
+
+Term ids follow the sorted vocabulary, so a saved index looks terms up by
+binary search in its memory-mapped vocabulary table (see kb_format).
+"""
+
+import os
+import re
+from typing import List, Dict, Any
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from kb_format import (
+    DocumentSequence, StringTable, documents_nbytes, load_array, read_manifest,
+    save_array, write_documents, write_manifest
+)
+
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Index arrays saved as memory-mapped .npy files
+INDEX_ARRAYS = ("postings_ptr", "postings_docs", "postings_weights", "max_weights", "idf", "doc_lengths")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with English stop words removed."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in ENGLISH_STOP_WORDS]
+
+
+class BM25Store:
+    """A retriever using Okapi BM25 over an inverted index."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty BM25 index.
+
+        Args:
+            k1: Term frequency saturation parameter
+            b: Document length normalization parameter
+        """
+        self.k1 = k1
+        self.b = b
+        self.documents = []
+        # term -> term id; a StringTable of sorted terms when loaded from disk
+        self.vocabulary = {}
+
+        # Postings in CSR layout: term t's postings are
+        # postings_docs/postings_weights[postings_ptr[t]:postings_ptr[t + 1]],
+        # sorted by document id
+        self.postings_ptr = None
+        self.postings_docs = None
+        self.postings_weights = None
+
+        # Per-term upper bound on its contribution to any document's score
+        self.max_weights = None
+        self.idf = None
+        self.doc_lengths = None
+        self.avg_length = 0.0
+
+    def add_documents(self, documents: List[Dict[str, Any]]):
+        """
+        Build the index for a set of documents.
+
+        Args:
+            documents: List of documents with text and metadata
+        """
+        self.documents = documents
+        counts, self.doc_lengths = self._term_counts(documents)
+        self.avg_length = float(self.doc_lengths.mean()) if len(documents) else 0.0
+
+        # Term ids follow sorted order
+        self.vocabulary = {term: i for i, term in enumerate(sorted({t for c in counts for t in c}))}
+
+        # Collect (term, doc, tf) triples
+        term_ids, doc_ids, term_freqs = self._postings(counts, 0)
+        num_terms = len(self.vocabulary)
+        doc_freqs = np.bincount(term_ids, minlength=num_terms)
+
+        # Precompute each posting's full BM25 contribution
+        num_docs = len(documents)
+        self.idf = np.log(1.0 + (num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        weights = self._weights(term_ids, term_freqs, self.doc_lengths[doc_ids])
+        self._set_postings(term_ids, doc_ids, weights, num_terms)
+
+    def update_documents(self, keep: List[int], new_documents: List[Dict[str, Any]]):
+        """
+        Keep the documents at the given indices (in order) and append new ones
+        without rebuilding the index.
+
+        Postings of kept documents are reused as they are, so IDF weights and
+        the average document length stay those of the last full build (terms
+        first seen here get an IDF from the updated corpus size); call
+        add_documents periodically to re-weight everything.
+
+        Args:
+            keep: Indices of existing documents to keep
+            new_documents: Documents to add after them
+        """
+        keep = np.asarray(keep, dtype=np.int64)
+        old_terms = sorted(self.vocabulary)
+
+        # Existing postings as (term, doc, weight), without removed documents
+        doc_map = np.full(len(self.documents), -1, dtype=np.int64)
+        doc_map[keep] = np.arange(len(keep))
+        term_ids = np.repeat(np.arange(len(old_terms), dtype=np.int64), np.diff(self.postings_ptr))
+        doc_ids = doc_map[self.postings_docs]
+        kept = doc_ids >= 0
+        term_ids, doc_ids, weights = term_ids[kept], doc_ids[kept], np.asarray(self.postings_weights)[kept]
+
+        # Merge the vocabularies, keeping term ids in sorted order
+        counts, new_lengths = self._term_counts(new_documents)
+        old_term_set = set(old_terms)
+        new_terms = {t for c in counts for t in c if t not in old_term_set}
+        self.vocabulary = {term: i for i, term in enumerate(sorted(old_term_set | new_terms))}
+        num_terms = len(self.vocabulary)
+        renumber = np.array([self.vocabulary[term] for term in old_terms], dtype=np.int64)
+        term_ids = renumber[term_ids] if len(old_terms) else term_ids
+
+        # Old terms keep their IDF; new terms get one from the updated corpus
+        num_docs = len(keep) + len(new_documents)
+        idf = np.zeros(num_terms, dtype=np.float32)
+        idf[renumber] = self.idf
+        new_term_ids, new_doc_ids, new_freqs = self._postings(counts, len(keep))
+        if len(new_terms):
+            new_ids = np.array([self.vocabulary[term] for term in new_terms], dtype=np.int64)
+            doc_freqs = np.bincount(new_term_ids, minlength=num_terms)[new_ids]
+            idf[new_ids] = np.log(1.0 + (num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        self.idf = idf
+
+        new_weights = self._weights(new_term_ids, new_freqs, new_lengths[new_doc_ids - len(keep)])
+        self.documents = [self.documents[i] for i in keep] + list(new_documents)
+        self.doc_lengths = np.concatenate([np.asarray(self.doc_lengths)[keep], new_lengths]).astype(np.int32)
+        self._set_postings(
+            np.concatenate([term_ids, new_term_ids]),
+            np.concatenate([doc_ids, new_doc_ids]),
+            np.concatenate([weights, new_weights]),
+            num_terms
+        )
+
+    @staticmethod
+    def _term_counts(documents: List[Dict[str, Any]]):
+        """Per-document term counts and document lengths"""
+        counts = []
+        for doc in documents:
+            doc_counts = {}
+            for token in tokenize(doc["text"]):
+                doc_counts[token] = doc_counts.get(token, 0) + 1
+            counts.append(doc_counts)
+        lengths = np.array([sum(c.values()) for c in counts], dtype=np.int32)
+        return counts, lengths
+
+    def _postings(self, counts, first_doc_id: int):
+        """(term id, doc id, tf) arrays for documents numbered from first_doc_id"""
+        term_ids, doc_ids, term_freqs = [], [], []
+        for doc_id, doc_counts in enumerate(counts, start=first_doc_id):
+            for token, count in doc_counts.items():
+                term_ids.append(self.vocabulary[token])
+                doc_ids.append(doc_id)
+                term_freqs.append(count)
+        return (
+            np.array(term_ids, dtype=np.int64),
+            np.array(doc_ids, dtype=np.int64),
+            np.array(term_freqs, dtype=np.float32)
+        )
+
+    def _weights(self, term_ids: np.ndarray, term_freqs: np.ndarray, doc_lengths: np.ndarray) -> np.ndarray:
+        """BM25 contribution of each posting"""
+        length_norm = self.k1 * (1.0 - self.b + self.b * doc_lengths / max(self.avg_length, 1e-9))
+        return (self.idf[term_ids] * term_freqs * (self.k1 + 1.0) / (term_freqs + length_norm)).astype(np.float32)
+
+    def _set_postings(self, term_ids: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray, num_terms: int):
+        """Group postings by term (doc ids ascending) and compute per-term upper bounds"""
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids = term_ids[order]
+        self.postings_docs = doc_ids[order].astype(np.int32)
+        self.postings_weights = weights[order].astype(np.float32)
+
+        self.postings_ptr = np.zeros(num_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=num_terms), out=self.postings_ptr[1:])
+
+        self.max_weights = np.zeros(num_terms, dtype=np.float32)
+        if len(term_ids):
+            np.maximum.at(self.max_weights, term_ids, self.postings_weights)
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Search for the documents with the highest BM25 score for the query.
+
+        Args:
+            query: Query text
+            top_k: Number of top results to return
+
+        Returns:
+            List of documents with BM25 scores (higher is more relevant); only
+            documents containing at least one query term are returned
+        """
+        if self.postings_ptr is None or not self.documents:
+            raise ValueError("No documents have been added to the vector store")
+
+        # Query term ids with their multiplicity
+        query_terms = {}
+        for token in tokenize(query):
+            term_id = self._term_id(token)
+            if term_id is not None:
+                query_terms[term_id] = query_terms.get(term_id, 0) + 1
+        if not query_terms or top_k <= 0:
+            return []
+
+        # MaxScore: process terms by decreasing upper bound. Once the k-th best
+        # score so far beats the combined bound of the remaining terms, no new
+        # document can enter the top k, so the remaining terms are only looked
+        # up (by binary search in their postings) for existing candidates.
+        terms = sorted(query_terms, key=lambda t: -self.max_weights[t] * query_terms[t])
+        bounds = np.array([self.max_weights[t] * query_terms[t] for t in terms])
+        remaining_bounds = np.concatenate([np.cumsum(bounds[::-1])[::-1][1:], [0.0]])
+
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        candidates = None
+        for i, term_id in enumerate(terms):
+            start, end = self.postings_ptr[term_id], self.postings_ptr[term_id + 1]
+            docs = self.postings_docs[start:end]
+            weights = self.postings_weights[start:end] * query_terms[term_id]
+
+            if candidates is None:
+                # Essential term: every posting can add a new candidate
+                scores[docs] += weights
+                if i + 1 < len(terms):
+                    threshold = self._kth_best(scores, top_k)
+                    if threshold > remaining_bounds[i]:
+                        candidates = np.flatnonzero(scores)
+            else:
+                # Non-essential term: only update existing candidates
+                positions = np.searchsorted(docs, candidates)
+                positions[positions == len(docs)] = 0
+                found = docs[positions] == candidates if len(docs) else np.zeros(len(candidates), dtype=bool)
+                scores[candidates[found]] += weights[positions[found]]
+
+        matched = np.flatnonzero(scores)
+        k = min(top_k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        results = []
+        for idx in top:
+            results.append({
+                "text": self.documents[idx]["text"],
+                "metadata": self.documents[idx]["metadata"],
+                "score": float(scores[idx])
+            })
+
+        return results
+
+    def embed_query(self, query: str) -> sparse.csr_matrix:
+        """
+        Embed a query as IDF-weighted term counts.
+
+        Args:
+            query: Query text
+
+        Returns:
+            L2-normalized 1 x vocabulary sparse vector
+        """
+        counts = {}
+        for token in tokenize(query):
+            term_id = self._term_id(token)
+            if term_id is not None:
+                counts[term_id] = counts.get(term_id, 0) + 1
+
+        term_ids = np.array(sorted(counts), dtype=np.int32)
+        weights = np.array([counts[t] for t in term_ids], dtype=np.float32) * self.idf[term_ids]
+        norm = np.linalg.norm(weights)
+        if norm > 0:
+            weights /= norm
+        return sparse.csr_matrix(
+            (weights, term_ids, np.array([0, len(term_ids)])),
+            shape=(1, len(self.vocabulary))
+        )
+
+    def nbytes(self) -> int:
+        """Approximate size of the documents and index (mapped or in memory)"""
+        arrays = sum(getattr(self, name).nbytes for name in INDEX_ARRAYS if getattr(self, name) is not None)
+        return documents_nbytes(self.documents) + arrays
+
+    def _term_id(self, token: str):
+        if isinstance(self.vocabulary, dict):
+            return self.vocabulary.get(token)
+        return self.vocabulary.find(token)
+
+    @staticmethod
+    def _kth_best(scores: np.ndarray, k: int) -> float:
+        """Score of the k-th best document so far (0 if fewer than k have a score)"""
+        nonzero = scores[scores > 0]
+        if len(nonzero) < k:
+            return 0.0
+        return float(np.partition(nonzero, len(nonzero) - k)[len(nonzero) - k])
+
+    def save(self, directory: str):
+        """
+        Save the index to disk.
+
+        Args:
+            directory: Directory to save the index
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        write_documents(directory, self.documents)
+        StringTable.write(directory, "vocabulary", sorted(self.vocabulary))
+        for name in INDEX_ARRAYS:
+            save_array(directory, name, getattr(self, name))
+        write_manifest(directory, "bm25", k1=self.k1, b=self.b, avg_length=self.avg_length)
+
+    @classmethod
+    def load(cls, directory: str):
+        """
+        Load an index from disk. Arrays are memory-mapped, not read.
+
+        Args:
+            directory: Directory where the index is saved
+
+        Returns:
+            Loaded BM25Store instance
+        """
+        manifest = read_manifest(directory)
+        if manifest is None or manifest["retriever"] != "bm25":
+            raise ValueError(f"No BM25 index found in {directory}")
+
+        instance = cls(k1=manifest["k1"], b=manifest["b"])
+        instance.avg_length = manifest["avg_length"]
+        instance.documents = DocumentSequence(directory)
+        instance.vocabulary = StringTable.open(directory, "vocabulary")
+        for name in INDEX_ARRAYS:
+            setattr(instance, name, load_array(directory, name))
+
+        return instance
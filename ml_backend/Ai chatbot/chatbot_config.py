@@ -81,3 +81,13 @@ def get_system_prompt(context, question):
         context=context,
         question=question
     )
+
+# Function to get the prompt template with the chatbot identity filled in
+def get_prompt_template():
+    """Return the system prompt template with {context} and {question} left as variables"""
+    return SYSTEM_PROMPT_TEMPLATE.format(
+        name=CHATBOT_NAME,
+        version=CHATBOT_VERSION,
+        context="{context}",
+        question="{question}"
+    )
@@ -0,0 +1,155 @@
+"""
+Content-addressed on-disk cache for PDF extraction results.
+
+Page texts are keyed by the PDF's content hash and the pypdf version;
+chunks additionally by the chunking parameters, so a parameter sweep
+re-chunks cached pages instead of re-extracting them. Entries are gzipped
+JSON files, and the least recently used ones are deleted once the cache
+grows past its size limit.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import pypdf
+
+# Bumped when the layout of cached chunks changes (2: page_start/page_end)
+CHUNKS_VERSION = 2
+
+
+class ExtractionCache:
+    """Size-bounded cache of per-page text and chunks for PDF files."""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding the cache entries
+            max_bytes: Size above which least recently used entries are deleted
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = sum(
+            os.path.getsize(os.path.join(cache_dir, name))
+            for name in os.listdir(cache_dir) if name.endswith(".json.gz")
+        )
+        # The limit may have been lowered since the entries were written
+        with self._lock:
+            self._evict()
+
+    def get_pages(self, file_hash: str) -> Optional[List[str]]:
+        """Cached page texts of a PDF, or None"""
+        return self._read(self._pages_key(file_hash))
+
+    def put_pages(self, file_hash: str, pages: List[str]):
+        self._write(self._pages_key(file_hash), pages)
+
+    def get_chunks(self, file_hash: str, chunk_size: int, chunk_overlap: int) -> Optional[List[Dict[str, Any]]]:
+        """Cached chunks of a PDF for the given chunking parameters, or None"""
+        return self._read(self._chunks_key(file_hash, chunk_size, chunk_overlap))
+
+    def put_chunks(self, file_hash: str, chunk_size: int, chunk_overlap: int, chunks: List[Dict[str, Any]]):
+        self._write(self._chunks_key(file_hash, chunk_size, chunk_overlap), chunks)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    @staticmethod
+    def _pages_key(file_hash: str) -> str:
+        return hashlib.sha256(f"pages:{file_hash}:{pypdf.__version__}".encode()).hexdigest()
+
+    @staticmethod
+    def _chunks_key(file_hash: str, chunk_size: int, chunk_overlap: int) -> str:
+        return hashlib.sha256(
+            f"chunks:{CHUNKS_VERSION}:{file_hash}:{pypdf.__version__}:{chunk_size}:{chunk_overlap}".encode()
+        ).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+    def _read(self, key: str):
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            # Corrupt entry: drop it and extract again
+            print(f"Discarding corrupt extraction cache entry {path}: {e}")
+            with self._lock:
+                self._delete(path)
+                self.misses += 1
+            return None
+
+        # The modification time records last use for eviction. The entry may
+        # have been evicted since it was read, which does not affect the value
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def _write(self, key: str, value):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(value, f)
+
+        with self._lock:
+            if os.path.exists(path):
+                self._size -= os.path.getsize(path)
+            os.replace(tmp_path, path)
+            self._size += os.path.getsize(path)
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until within max_bytes. Caller holds the lock."""
+        if self._size <= self.max_bytes:
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json.gz"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        for _, size, path in sorted(entries):
+            if self._size <= self.max_bytes:
+                break
+            if self._delete(path, size):
+                self.evictions += 1
+
+    def _delete(self, path: str, size: Optional[int] = None) -> bool:
+        try:
+            size = os.path.getsize(path) if size is None else size
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        self._size -= size
+        return True
@@ -0,0 +1,221 @@
+"""
+Versioned, pickle-free on-disk format for knowledge bases.
+
+A knowledge base directory contains:
+- manifest.json: format version, retriever type and its parameters
+- texts.bin / texts_offsets.npy: chunk texts as one UTF-8 blob indexed by offsets
+- metadata.json / meta_<n>.npy: chunk metadata stored column by column
+- <name>_data.npy, <name>_indices.npy, ...: retriever arrays
+
+Every array is opened with numpy's mmap_mode, so loading a knowledge base
+only reads the small JSON files and worker processes serving the same
+knowledge base share its pages through the OS cache.
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from scipy import sparse
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+
+def write_manifest(directory: str, retriever: str, **params):
+    """Write the manifest; call this last so a partially written KB has none"""
+    manifest = {"format_version": FORMAT_VERSION, "retriever": retriever, **params}
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+
+def read_manifest(directory: str) -> Optional[Dict[str, Any]]:
+    """Read the manifest, or return None for a legacy (pickled) knowledge base"""
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported knowledge base format version {manifest.get('format_version')} in {directory}")
+    return manifest
+
+
+def save_array(directory: str, name: str, array: np.ndarray):
+    np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+
+
+def load_array(directory: str, name: str) -> np.ndarray:
+    """Memory-map a saved array read-only"""
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+
+def csr_nbytes(matrix: Optional[sparse.csr_matrix]) -> int:
+    if matrix is None:
+        return 0
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def documents_nbytes(documents) -> int:
+    """Approximate size of a document list or DocumentSequence"""
+    if isinstance(documents, DocumentSequence):
+        return documents.nbytes()
+    return sum(len(doc["text"]) for doc in documents)
+
+
+def save_csr(directory: str, name: str, matrix: sparse.csr_matrix):
+    save_array(directory, f"{name}_data", matrix.data)
+    save_array(directory, f"{name}_indices", matrix.indices)
+    save_array(directory, f"{name}_indptr", matrix.indptr)
+    save_array(directory, f"{name}_shape", np.array(matrix.shape, dtype=np.int64))
+
+
+def load_csr(directory: str, name: str) -> sparse.csr_matrix:
+    """Build a CSR matrix directly on top of memory-mapped arrays"""
+    shape = tuple(int(n) for n in np.load(os.path.join(directory, f"{name}_shape.npy")))
+    return sparse.csr_matrix(
+        (
+            load_array(directory, f"{name}_data"),
+            load_array(directory, f"{name}_indices"),
+            load_array(directory, f"{name}_indptr")
+        ),
+        shape=shape,
+        copy=False
+    )
+
+
+class StringTable:
+    """A read-only list of strings stored as one UTF-8 blob plus offsets"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @staticmethod
+    def write(directory: str, name: str, strings: Iterable[str]):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+            f.write(b"".join(encoded))
+        save_array(directory, f"{name}_offsets", offsets)
+
+    @classmethod
+    def open(cls, directory: str, name: str) -> "StringTable":
+        path = os.path.join(directory, f"{name}.bin")
+        # An empty file cannot be memory-mapped
+        if os.path.getsize(path) == 0:
+            blob = np.zeros(0, dtype=np.uint8)
+        else:
+            blob = np.memmap(path, dtype=np.uint8, mode="r")
+        return cls(blob, load_array(directory, f"{name}_offsets"))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def find(self, value: str) -> Optional[int]:
+        """Binary search for a string; the table must have been written sorted"""
+        target = value.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = bytes(self.blob[self.offsets[mid]:self.offsets[mid + 1]])
+            if current < target:
+                lo = mid + 1
+            elif current > target:
+                hi = mid
+            else:
+                return mid
+        return None
+
+
+def write_documents(directory: str, documents: List[Dict[str, Any]]):
+    """
+    Write chunk texts and metadata.
+
+    Metadata is split into one column per key: integer columns become int64
+    arrays, string columns become int32 codes into a table of distinct
+    values (source and file_path repeat for every chunk of a PDF), and
+    anything else is kept as a JSON list.
+    """
+    StringTable.write(directory, "texts", (doc["text"] for doc in documents))
+
+    keys = []
+    for doc in documents:
+        for key in doc["metadata"]:
+            if key not in keys:
+                keys.append(key)
+
+    columns = []
+    for n, key in enumerate(keys):
+        values = [doc["metadata"].get(key) for doc in documents]
+        if all(type(v) is int for v in values):
+            save_array(directory, f"meta_{n}", np.array(values, dtype=np.int64))
+            columns.append({"key": key, "kind": "int"})
+        elif all(v is None or isinstance(v, str) for v in values):
+            distinct = {}
+            codes = np.array(
+                [-1 if v is None else distinct.setdefault(v, len(distinct)) for v in values],
+                dtype=np.int32
+            )
+            save_array(directory, f"meta_{n}", codes)
+            columns.append({"key": key, "kind": "str", "values": list(distinct)})
+        else:
+            columns.append({"key": key, "kind": "json", "values": values})
+
+    with open(os.path.join(directory, "metadata.json"), "w") as f:
+        json.dump({"columns": columns}, f)
+
+
+class DocumentSequence:
+    """
+    Read-only sequence of {"text", "metadata"} documents backed by the files
+    written by write_documents. Documents are materialized on access.
+    """
+
+    def __init__(self, directory: str):
+        self.texts = StringTable.open(directory, "texts")
+        with open(os.path.join(directory, "metadata.json"), "r") as f:
+            self.columns = json.load(f)["columns"]
+        for n, column in enumerate(self.columns):
+            if column["kind"] in ("int", "str"):
+                column["codes"] = load_array(directory, f"meta_{n}")
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def nbytes(self) -> int:
+        return self.texts.blob.nbytes + self.texts.offsets.nbytes + sum(
+            column["codes"].nbytes for column in self.columns if "codes" in column
+        )
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("document index out of range")
+
+        metadata = {}
+        for column in self.columns:
+            if column["kind"] == "int":
+                metadata[column["key"]] = int(column["codes"][index])
+            elif column["kind"] == "str":
+                code = int(column["codes"][index])
+                if code >= 0:
+                    metadata[column["key"]] = column["values"][code]
+            elif column["values"][index] is not None:
+                metadata[column["key"]] = column["values"][index]
+
+        return {"text": self.texts[index], "metadata": metadata}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,155 @@
+"""
+Background jobs for knowledge base builds.
+
+Building a knowledge base extracts PDFs and fits an index, which takes far
+longer than a request should. JobQueue runs builds on a small thread pool
+(one worker by default, so builds that replace the default knowledge base
+never race) and keeps their status and progress for /api/jobs/{id}.
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Job:
+    """Status and progress of one knowledge base build."""
+
+    def __init__(self, kind: str, params: Dict[str, Any]):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.progress = {"stage": QUEUED, "files_total": 0, "files_done": 0, "pages": 0, "chunks": 0}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = _now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def set_stage(self, stage: str, files_total: Optional[int] = None):
+        with self._lock:
+            self.progress["stage"] = stage
+            if files_total is not None:
+                self.progress["files_total"] = files_total
+
+    def file_done(self, pdf_path: str, num_pages: int, num_chunks: int):
+        """Progress callback for PDFProcessor"""
+        with self._lock:
+            self.progress["files_done"] += 1
+            self.progress["pages"] += num_pages
+            self.progress["chunks"] += num_chunks
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "params": self.params,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at
+            }
+
+
+class JobQueue:
+    """Runs jobs on a thread pool and remembers the most recent ones."""
+
+    def __init__(self, max_workers: int = 1, max_history: int = 100):
+        """
+        Initialize the queue.
+
+        Args:
+            max_workers: Jobs run at the same time
+            max_history: Finished jobs kept for status lookups
+        """
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kb-job")
+        # job id -> Job, oldest first
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # key -> id of the queued or running job submitted with it
+        self._active: Dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, params: Dict[str, Any], fn: Callable[[Job], Dict[str, Any]]) -> Job:
+        """
+        Queue fn(job) unless an identical job is already queued or running.
+
+        Returns:
+            The new job, or the unfinished job with the same kind and params
+        """
+        key = (kind, tuple(sorted(params.items())))
+        with self._lock:
+            active_id = self._active.get(key)
+            if active_id is not None:
+                return self._jobs[active_id]
+
+            job = Job(kind, params)
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+            self._trim()
+        self._executor.submit(self._run, job, key, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        """Known jobs, newest first"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job: Job, key: Hashable, fn: Callable[[Job], Dict[str, Any]]):
+        with job._lock:
+            job.status = RUNNING
+            job.progress["stage"] = RUNNING
+            job.started_at = _now()
+        try:
+            result = fn(job)
+            with job._lock:
+                job.result = result
+                job.status = COMPLETED
+                job.progress["stage"] = COMPLETED
+        except Exception as e:
+            # HTTPException keeps its message in detail
+            with job._lock:
+                job.error = str(getattr(e, "detail", None) or e)
+                job.status = FAILED
+                job.progress["stage"] = FAILED
+        finally:
+            with job._lock:
+                job.finished_at = _now()
+            with self._lock:
+                if self._active.get(key) == job.id:
+                    del self._active[key]
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond max_history. Caller holds the lock."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
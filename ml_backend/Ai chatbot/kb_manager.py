@@ -0,0 +1,184 @@
+"""
+Keeps a bounded set of knowledge bases resident in memory.
+
+Knowledge bases are loaded on first request and evicted least recently
+used first once either the number of resident knowledge bases or their
+combined size exceeds its limit. IDs that failed to load are remembered
+for a short time, so requests for an unknown knowledge base do not hit the
+disk again and again. Loading happens outside the manager's lock, so a slow
+load only holds up requests for the same knowledge base.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+class KnowledgeBaseManager:
+    """LRU cache of loaded knowledge base stores keyed by KB ID."""
+
+    def __init__(
+        self,
+        loader: Callable[[str], Optional[Any]],
+        max_kbs: int = 4,
+        max_bytes: Optional[int] = None,
+        negative_ttl: float = 30,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the manager.
+
+        Args:
+            loader: Loads a knowledge base by ID, returning None if it does not exist
+            max_kbs: Maximum number of resident knowledge bases
+            max_bytes: Maximum combined size of resident knowledge bases (None for no limit)
+            negative_ttl: Seconds a knowledge base that failed to load is reported missing without retrying
+            clock: Time source for negative_ttl
+        """
+        self.loader = loader
+        self.max_kbs = max_kbs
+        self.max_bytes = max_bytes
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+
+        # kb_id -> (store, size in bytes), least recently used first
+        self._resident: "OrderedDict[str, tuple]" = OrderedDict()
+        # kb_id -> time until which it is known to be missing, oldest first
+        # (the TTL is fixed, so insertion order is expiry order)
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        # kb_id -> lock held while it is being loaded
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.negative_hits = 0
+
+    def get(self, kb_id: str) -> Optional[Any]:
+        """Return a knowledge base, loading it if it is not resident"""
+        with self._lock:
+            if kb_id in self._resident:
+                self._resident.move_to_end(kb_id)
+                self.hits += 1
+                return self._resident[kb_id][0]
+            self.misses += 1
+            if self._known_missing(kb_id):
+                return None
+            load_lock = self._loading.setdefault(kb_id, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                # Another request may have loaded it while this one waited
+                if kb_id in self._resident:
+                    self._resident.move_to_end(kb_id)
+                    return self._resident[kb_id][0]
+                if self._known_missing(kb_id):
+                    return None
+
+            try:
+                store = self.loader(kb_id)
+            except BaseException:
+                with self._lock:
+                    self._loading.pop(kb_id, None)
+                raise
+
+            with self._lock:
+                self._loading.pop(kb_id, None)
+                # A build may have put a newer store while this one loaded
+                if kb_id in self._resident:
+                    self._resident.move_to_end(kb_id)
+                    return self._resident[kb_id][0]
+                if store is None:
+                    if self.negative_ttl > 0:
+                        self._expire_missing()
+                        self._missing[kb_id] = self.clock() + self.negative_ttl
+                    return None
+                self.loads += 1
+                self._add(kb_id, store)
+                return store
+
+    def put(self, kb_id: str, store: Any):
+        """Make a newly built knowledge base resident"""
+        with self._lock:
+            self._missing.pop(kb_id, None)
+            self._resident.pop(kb_id, None)
+            self._add(kb_id, store)
+
+    def evict(self, kb_id: str) -> bool:
+        """Drop a knowledge base from memory; it is reloaded on next use"""
+        with self._lock:
+            if self._resident.pop(kb_id, None) is None:
+                return False
+            self.evictions += 1
+            return True
+
+    def forget_missing(self):
+        """Retry every knowledge base that failed to load on its next request"""
+        with self._lock:
+            self._missing.clear()
+
+    def __contains__(self, kb_id: str) -> bool:
+        with self._lock:
+            return kb_id in self._resident
+
+    def resident_ids(self) -> List[str]:
+        """IDs of resident knowledge bases, least recently used first"""
+        with self._lock:
+            return list(self._resident)
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(size for _, size in self._resident.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Resident set and cache counters"""
+        with self._lock:
+            return {
+                "resident": [
+                    {"kb_id": kb_id, "bytes": size, "num_documents": len(store.documents)}
+                    for kb_id, (store, size) in self._resident.items()
+                ],
+                "num_resident": len(self._resident),
+                "resident_bytes": self.resident_bytes(),
+                "max_kbs": self.max_kbs,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "negative_hits": self.negative_hits,
+                "num_missing": len(self._missing)
+            }
+
+    def _known_missing(self, kb_id: str) -> bool:
+        """Whether kb_id failed to load within negative_ttl. Caller holds the lock."""
+        missing_until = self._missing.get(kb_id)
+        if missing_until is None:
+            return False
+        if missing_until > self.clock():
+            self.negative_hits += 1
+            return True
+        del self._missing[kb_id]
+        return False
+
+    def _expire_missing(self):
+        """Drop expired negative entries so random IDs cannot grow the map. Caller holds the lock."""
+        now = self.clock()
+        while self._missing and next(iter(self._missing.values())) <= now:
+            self._missing.popitem(last=False)
+
+    def _add(self, kb_id: str, store: Any):
+        """Insert as most recently used and evict until within limits. Caller holds the lock."""
+        nbytes = store.nbytes() if hasattr(store, "nbytes") else 0
+        self._resident[kb_id] = (store, nbytes)
+
+        # Never evict the knowledge base that was just added
+        while len(self._resident) > 1 and (
+            len(self._resident) > self.max_kbs
+            or (self.max_bytes is not None and self.resident_bytes() > self.max_bytes)
+        ):
+            self._resident.popitem(last=False)
+            self.evictions += 1
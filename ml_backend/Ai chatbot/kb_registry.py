@@ -0,0 +1,122 @@
+"""
+In-memory view of kb_info.json.
+
+The registry keeps the parsed knowledge base info in memory and re-reads
+the file only when its modification time or size changes (checked at most
+every check_interval seconds, so another worker's update is picked up
+without a stat per request). Writes go through a temporary file and an
+atomic rename, so readers never see a partially written file.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class KnowledgeBaseRegistry:
+    """Cached, atomically written knowledge base info."""
+
+    def __init__(
+        self,
+        path: str,
+        check_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            path: Path of kb_info.json
+            check_interval: Seconds between checks of the file for outside changes
+            clock: Time source for check_interval
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.clock = clock
+
+        self._info: Dict[str, Any] = {}
+        # (mtime_ns, size) of the file the cached info was read from, None if missing
+        self._signature: Optional[tuple] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+        self.reads = 0
+
+    def load(self) -> Dict[str, Any]:
+        """A copy of the knowledge base info, safe to modify and pass to save()"""
+        with self._lock:
+            self._refresh()
+            return dict(self._info)
+
+    def get(self, kb_id: str) -> Optional[Dict[str, Any]]:
+        """Info for one knowledge base, or None"""
+        with self._lock:
+            self._refresh()
+            return self._info.get(kb_id)
+
+    def default_kb_id(self) -> Optional[str]:
+        with self._lock:
+            self._refresh()
+            return self._info.get("default_kb_id")
+
+    def save(self, info: Dict[str, Any]):
+        """Replace the knowledge base info on disk and in memory"""
+        with self._lock:
+            self._write(info)
+
+    def update(self, fn: Callable[[Dict[str, Any]], Any]) -> Any:
+        """
+        Modify the info in place with fn and write it, with no other save in between.
+
+        Returns:
+            The return value of fn
+        """
+        with self._lock:
+            self._refresh(force=True)
+            info = dict(self._info)
+            result = fn(info)
+            self._write(info)
+            return result
+
+    def invalidate(self):
+        """Re-read the file on next access"""
+        with self._lock:
+            self._checked_at = None
+            self._signature = None
+
+    def _refresh(self, force: bool = False):
+        """Re-read the file if it changed. Caller holds the lock."""
+        now = self.clock()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        signature = self._stat()
+        if signature == self._signature:
+            return
+        if signature is None:
+            self._info = {}
+        else:
+            with open(self.path, "r") as f:
+                self._info = json.load(f)
+            self.reads += 1
+        self._signature = signature
+
+    def _write(self, info: Dict[str, Any]):
+        """Write through a temporary file and rename it into place. Caller holds the lock."""
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(info, f)
+        os.replace(tmp_path, self.path)
+        self._info = dict(info)
+        self._signature = self._stat()
+        self._checked_at = self.clock()
+
+    def _stat(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
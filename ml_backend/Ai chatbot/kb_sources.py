@@ -0,0 +1,114 @@
+"""
+Per-knowledge-base manifest of the PDF files it was built from.
+
+sources.json in a knowledge base directory maps each PDF (by path relative
+to the data directory) to its content hash and the indices of its chunks,
+so an update only needs to extract files whose hash changed.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SOURCES_FILE = "sources.json"
+
+
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def load_sources(kb_dir: str) -> Optional[Dict[str, Any]]:
+    """Load a knowledge base's source manifest, or None if it has none"""
+    path = os.path.join(kb_dir, SOURCES_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_sources(kb_dir: str, sources: Dict[str, Any]):
+    with open(os.path.join(kb_dir, SOURCES_FILE), "w") as f:
+        json.dump(sources, f)
+
+
+def scan_files(
+    pdf_paths: List[str],
+    data_dir: str,
+    previous: Optional[Dict[str, Any]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Hash the current PDF files.
+
+    Files whose size and modification time match the previous manifest
+    reuse its hash instead of being read again.
+
+    Returns:
+        Relative path -> {"path", "sha256", "size", "mtime"}, in pdf_paths order
+    """
+    known = (previous or {}).get("files", {})
+    files = {}
+    for path in pdf_paths:
+        key = os.path.relpath(path, data_dir)
+        stat = os.stat(path)
+        entry = known.get(key)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            sha = entry["sha256"]
+        else:
+            sha = file_sha256(path)
+        files[key] = {"path": path, "sha256": sha, "size": stat.st_size, "mtime": stat.st_mtime}
+    return files
+
+
+def plan_update(
+    sources: Dict[str, Any],
+    current: Dict[str, Dict[str, Any]]
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Compare a knowledge base's manifest with the current files.
+
+    Returns:
+        (unchanged, changed or new, removed) relative paths
+    """
+    known = sources["files"]
+    unchanged = [key for key in known if key in current and current[key]["sha256"] == known[key]["sha256"]]
+    changed = [key for key in current if key not in known or current[key]["sha256"] != known[key]["sha256"]]
+    removed = [key for key in known if key not in current]
+    return unchanged, changed, removed
+
+
+def count_chunks(documents: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """Number of chunks per file_path in chunk metadata"""
+    counts = {}
+    for doc in documents:
+        path = doc["metadata"].get("file_path")
+        counts[path] = counts.get(path, 0) + 1
+    return counts
+
+
+def build_sources(
+    files: List[Tuple[str, Dict[str, Any], int]],
+    updates_since_reweight: int = 0
+) -> Dict[str, Any]:
+    """
+    Build a manifest for a knowledge base whose chunks are grouped by file.
+
+    Args:
+        files: (relative path, scan_files entry, number of chunks) in chunk order
+        updates_since_reweight: Incremental updates since the index was last fully rebuilt
+    """
+    manifest = {}
+    next_id = 0
+    for key, entry, num_chunks in files:
+        manifest[key] = {
+            "sha256": entry["sha256"],
+            "size": entry["size"],
+            "mtime": entry["mtime"],
+            "chunk_ids": list(range(next_id, next_id + num_chunks))
+        }
+        next_id += num_chunks
+    return {"files": manifest, "updates_since_reweight": updates_since_reweight}
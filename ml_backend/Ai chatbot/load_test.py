@@ -0,0 +1,151 @@
+"""
+Load test for /api/chat against a local mock LLM.
+
+Usage:
+    python load_test.py [--latency 0.5] [--requests 64] [--concurrency 1 4 16 64] [--blocking]
+    python load_test.py --retrieval [--requests 64]
+
+The API runs in-process (httpx ASGI transport, one event loop like a single
+uvicorn worker) with the default knowledge base and a mock chat model that
+takes --latency seconds per answer. Response caches are disabled so every
+request reaches the LLM. Throughput should grow with concurrency up to
+MAX_CONCURRENT_LLM_CALLS; --blocking makes the mock block the event loop
+like a synchronous LLM call would, which serializes all requests.
+
+--retrieval instead indexes the default knowledge base's chunks with every
+retriever and reports search latency per query, without the API or an LLM.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+import api
+from rag_chain import RAGChain
+
+# Questions for --retrieval, cycled to make up --requests searches
+RETRIEVAL_QUESTIONS = [
+    "What helps with morning sickness?",
+    "How much weight should I gain during pregnancy?",
+    "Is it safe to exercise while pregnant?",
+    "What are the signs of preterm labor?",
+    "Which foods should I avoid?",
+    "When is the first ultrasound?",
+    "How can I relieve back pain?",
+    "What causes gestational diabetes?"
+]
+
+
+def mock_llm(latency: float, blocking: bool):
+    """A chat model stand-in that answers after a fixed delay"""
+    def answer(prompt):
+        time.sleep(latency)
+        return AIMessage(content="Mock answer.")
+
+    async def aanswer(prompt):
+        if blocking:
+            time.sleep(latency)
+        else:
+            await asyncio.sleep(latency)
+        return AIMessage(content="Mock answer.")
+
+    return RunnableLambda(answer, afunc=aanswer)
+
+
+async def run_level(client: httpx.AsyncClient, num_requests: int, concurrency: int) -> dict:
+    """Send num_requests chats with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/chat",
+                json={"question": f"What helps with morning sickness? ({i})", "top_k": 5}
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(num_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput": num_requests / elapsed,
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95) - 1]
+    }
+
+
+async def main_async(args):
+    api.rag_chain = RAGChain(llm=mock_llm(args.latency, args.blocking))
+    # Measure the LLM path, not the caches
+    for cache in (api.retrieval_cache, api.answer_cache, api.semantic_cache):
+        cache.max_size = 0
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=None) as client:
+        # Load the knowledge base before timing
+        await run_level(client, 1, 1)
+
+        print(f"Mock LLM latency {args.latency:.2f}s, {args.requests} requests per level"
+              f"{' (blocking)' if args.blocking else ''}")
+        print(f"{'concurrency':>12} {'req/s':>8} {'p50 (s)':>8} {'p95 (s)':>8}")
+        for concurrency in args.concurrency:
+            result = await run_level(client, args.requests, concurrency)
+            print(f"{result['concurrency']:>12} {result['throughput']:>8.1f} "
+                  f"{result['p50']:>8.2f} {result['p95']:>8.2f}")
+
+
+def run_retrieval(args):
+    """Time searches with each retriever over the default knowledge base's chunks"""
+    kb_id = api.kb_registry.default_kb_id()
+    kb = api.kb_manager.get(kb_id) if kb_id else None
+    if kb is None:
+        raise SystemExit("No default knowledge base; process PDFs first")
+    documents = list(kb.documents)
+    questions = [RETRIEVAL_QUESTIONS[i % len(RETRIEVAL_QUESTIONS)] for i in range(args.requests)]
+
+    print(f"{len(documents)} chunks, {len(questions)} searches per retriever, top_k 5")
+    print(f"{'retriever':>12} {'index (s)':>10} {'mean (ms)':>10} {'p95 (ms)':>10}")
+    for name, retriever_class in api.RETRIEVERS.items():
+        start = time.perf_counter()
+        store = retriever_class()
+        store.add_documents(documents)
+        index_time = time.perf_counter() - start
+
+        # Warm up before timing
+        store.search(questions[0], top_k=5)
+        latencies = []
+        for question in questions:
+            start = time.perf_counter()
+            store.search(question, top_k=5)
+            latencies.append(time.perf_counter() - start)
+
+        latencies.sort()
+        print(f"{name:>12} {index_time:>10.2f} {1000 * sum(latencies) / len(latencies):>10.3f} "
+              f"{1000 * latencies[int(len(latencies) * 0.95) - 1]:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/chat with a mock LLM")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock LLM latency in seconds")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="Concurrency levels")
+    parser.add_argument("--blocking", action="store_true", help="Make the mock LLM block the event loop")
+    parser.add_argument("--retrieval", action="store_true", help="Measure search latency of each retriever instead")
+    args = parser.parse_args()
+    if args.retrieval:
+        run_retrieval(args)
+    else:
+        asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Convert knowledge bases saved in the legacy pickle format to the
+memory-mapped format (see kb_format.py).
+
+Usage:
+    python migrate_kb_format.py [--vector-store-dir vector_store]
+
+Each legacy knowledge base is rewritten into a temporary directory and then
+swapped into place; knowledge bases that already have a manifest are skipped.
+"""
+import argparse
+import os
+import shutil
+
+from alternative_vector_store import AlternativeVectorStore
+from kb_format import read_manifest
+
+
+def migrate(vector_store_dir: str) -> list:
+    """Convert every legacy knowledge base in the directory, returning their IDs"""
+    converted = []
+    for kb_id in sorted(os.listdir(vector_store_dir)):
+        kb_dir = os.path.join(vector_store_dir, kb_id)
+        if not os.path.isdir(kb_dir) or read_manifest(kb_dir) is not None:
+            continue
+        if not os.path.exists(os.path.join(kb_dir, "vector_store.pkl")):
+            continue
+
+        store = AlternativeVectorStore.load(kb_dir)
+        tmp_dir = kb_dir + ".converting"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        store.save(tmp_dir)
+
+        old_dir = kb_dir + ".legacy"
+        os.replace(kb_dir, old_dir)
+        os.replace(tmp_dir, kb_dir)
+        shutil.rmtree(old_dir)
+        converted.append(kb_id)
+
+    return converted
+
+
+def main():
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vector_store")
+    parser = argparse.ArgumentParser(description="Convert pickled knowledge bases to the memory-mapped format")
+    parser.add_argument("--vector-store-dir", default=default_dir, help="Directory containing the knowledge bases")
+    args = parser.parse_args()
+
+    converted = migrate(args.vector_store_dir)
+    print(f"Converted {len(converted)} knowledge base(s) in {args.vector_store_dir}")
+
+
+if __name__ == "__main__":
+    main()
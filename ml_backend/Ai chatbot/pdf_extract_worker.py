@@ -0,0 +1,18 @@
+"""
+Page extraction run in PDFProcessor's worker processes.
+
+Workers are started with the spawn method, so each one imports the module
+its task function lives in. Keeping that function here, with only pypdf as
+a dependency, means a worker does not load the text splitter, the
+retrievers or the API just to extract pages.
+"""
+
+from typing import List
+
+from pypdf import PdfReader
+
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) of a PDF"""
+    pdf_reader = PdfReader(pdf_path)
+    return [pdf_reader.pages[i].extract_text() or "" for i in range(start, end)]
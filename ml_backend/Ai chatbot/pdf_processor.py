@@ -1,25 +1,47 @@
+import bisect
+import multiprocessing
 import os
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Callable, Iterator, Optional
 from pypdf import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from extraction_cache import ExtractionCache
+from kb_sources import file_sha256
+from pdf_extract_worker import extract_page_range
+
+
 class PDFProcessor:
     """Class to extract text from PDF files and process into chunks."""
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        max_workers: Optional[int] = None,
+        pages_per_task: int = 25,
+        cache: Optional[ExtractionCache] = None
+    ):
         """
         Initialize the PDFProcessor.
         
         Args:
             chunk_size: Size of text chunks for vector embedding
             chunk_overlap: Overlap between chunks to maintain context
+            max_workers: Worker processes for extraction (defaults to the CPU count)
+            pages_per_task: Pages extracted by one worker task
+            cache: Optional on-disk cache of extracted pages and chunks
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.cache = cache
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
-            length_function=len
+            length_function=len,
+            add_start_index=True
         )
     
     def extract_text_from_pdf(self, pdf_path: str) -> str:
@@ -35,15 +57,13 @@ class PDFProcessor:
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
             
-        raw_text = ""
         pdf_reader = PdfReader(pdf_path)
-        
-        for page in pdf_reader.pages:
-            text = page.extract_text()
-            if text:
-                raw_text += text + "\n"
-                
-        return raw_text
+        return self._join_pages(page.extract_text() for page in pdf_reader.pages)
+    
+    @staticmethod
+    def _join_pages(page_texts) -> str:
+        """Join page texts in one pass (repeated += is quadratic in document size)"""
+        return "".join(text + "\n" for text in page_texts if text)
     
     def process_pdf(self, pdf_path: str) -> List[str]:
         """
@@ -59,31 +79,224 @@ class PDFProcessor:
         chunks = self.text_splitter.split_text(raw_text)
         return chunks
     
-    def process_multiple_pdfs(self, pdf_paths: List[str]) -> List[Dict[str, Any]]:
+    def process_multiple_pdfs(
+        self,
+        pdf_paths: List[str],
+        file_hashes: Optional[Dict[str, str]] = None,
+        progress: Optional[Callable[[str, int, int], None]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Process multiple PDF files and create metadata for each chunk.
         
         Args:
             pdf_paths: List of paths to PDF files
+            file_hashes: Known SHA-256 hashes by path, to avoid hashing again for the cache
+            progress: Called with (pdf_path, number of pages, number of chunks) as each file is done
             
         Returns:
             List of dictionaries containing text chunks and their metadata
         """
-        all_docs = []
+        return list(self.iter_documents(pdf_paths, file_hashes, progress))
+    
+    def iter_documents(
+        self,
+        pdf_paths: List[str],
+        file_hashes: Optional[Dict[str, str]] = None,
+        progress: Optional[Callable[[str, int, int], None]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Process multiple PDF files, yielding each file's chunks as soon as its pages are extracted.
         
-        for pdf_path in pdf_paths:
-            file_name = os.path.basename(pdf_path)
-            chunks = self.process_pdf(pdf_path)
+        Pages of all files are split into ranges of pages_per_task pages and
+        extracted in parallel by a process pool. The pool spawns its workers,
+        and a spawned worker re-imports the program's main module, so a
+        script that calls this with max_workers > 1 must keep its top-level
+        work under an `if __name__ == "__main__":` guard. Files are yielded in input
+        order, so chunk order matches process_multiple_pdfs. With a cache,
+        files whose chunks are cached for this chunk size and overlap are
+        not opened at all, and only files without cached pages are extracted.
+        
+        Args:
+            pdf_paths: List of paths to PDF files
+            file_hashes: Known SHA-256 hashes by path, to avoid hashing again for the cache
+            progress: Called with (pdf_path, number of pages, number of chunks) as each file is done
             
-            for i, chunk in enumerate(chunks):
-                doc_info = {
-                    "text": chunk,
-                    "metadata": {
-                        "source": file_name,
-                        "chunk_id": i,
-                        "file_path": pdf_path
-                    }
+        Yields:
+            Dictionaries containing a text chunk and its metadata
+        """
+        if self.cache is None:
+            for pdf_path, page_texts in self.iter_page_texts(pdf_paths):
+                chunks = self._split_pages(page_texts)
+                if progress:
+                    progress(pdf_path, len(page_texts), len(chunks))
+                yield from self._documents(pdf_path, chunks)
+            return
+        
+        file_hashes = self._file_hashes(pdf_paths, file_hashes)
+        cached_chunks = {
+            pdf_path: self.cache.get_chunks(file_hashes[pdf_path], self.chunk_size, self.chunk_overlap)
+            for pdf_path in pdf_paths
+        }
+        
+        # Pages are only needed for files whose chunks are not cached
+        uncached = [pdf_path for pdf_path in pdf_paths if cached_chunks[pdf_path] is None]
+        page_texts_iter = self.iter_page_texts(uncached, file_hashes)
+        try:
+            for pdf_path in pdf_paths:
+                chunks = cached_chunks[pdf_path]
+                if chunks is None:
+                    _, page_texts = next(page_texts_iter)
+                    num_pages = len(page_texts)
+                    chunks = self._split_pages(page_texts)
+                    self.cache.put_chunks(file_hashes[pdf_path], self.chunk_size, self.chunk_overlap, chunks)
+                else:
+                    # Trailing pages without text are not counted for cached chunks
+                    num_pages = max((chunk["page_end"] or 0 for chunk in chunks), default=0)
+                if progress:
+                    progress(pdf_path, num_pages, len(chunks))
+                yield from self._documents(pdf_path, chunks)
+        finally:
+            page_texts_iter.close()
+    
+    def _split_pages(self, page_texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Split a file's pages into chunks that record the pages they span.
+        
+        The pages are joined in one pass that notes where each page starts;
+        the splitter reports each chunk's start offset, so the first and
+        last page of a chunk are found by binary search over those offsets.
+        
+        Returns:
+            {"text", "page_start", "page_end"} per chunk, with 1-based page numbers
+            (None when a chunk's position in the text is unknown)
+        """
+        parts = []
+        page_offsets = []
+        page_numbers = []
+        offset = 0
+        for page_number, text in enumerate(page_texts, start=1):
+            # Same text as _join_pages: empty pages are skipped
+            if text:
+                page_offsets.append(offset)
+                page_numbers.append(page_number)
+                parts.append(text + "\n")
+                offset += len(text) + 1
+        
+        chunks = []
+        for doc in self.text_splitter.create_documents(["".join(parts)]):
+            start = doc.metadata["start_index"]
+            if start < 0:
+                # The splitter could not locate the chunk in the text; its pages are unknown
+                chunks.append({"text": doc.page_content, "page_start": None, "page_end": None})
+                continue
+            end = start + max(len(doc.page_content), 1) - 1
+            chunks.append({
+                "text": doc.page_content,
+                "page_start": page_numbers[bisect.bisect_right(page_offsets, start) - 1],
+                "page_end": page_numbers[bisect.bisect_right(page_offsets, end) - 1]
+            })
+        return chunks
+    
+    @staticmethod
+    def _documents(pdf_path: str, chunks: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Attach chunk metadata"""
+        file_name = os.path.basename(pdf_path)
+        for i, chunk in enumerate(chunks):
+            yield {
+                "text": chunk["text"],
+                "metadata": {
+                    "source": file_name,
+                    "chunk_id": i,
+                    "file_path": pdf_path,
+                    "page_start": chunk["page_start"],
+                    "page_end": chunk["page_end"]
                 }
-                all_docs.append(doc_info)
-                
-        return all_docs
+            }
+    
+    @staticmethod
+    def _file_hashes(pdf_paths: List[str], file_hashes: Optional[Dict[str, str]]) -> Dict[str, str]:
+        """Content hashes of the files, hashing only those not already known"""
+        hashes = dict(file_hashes or {})
+        for pdf_path in pdf_paths:
+            if pdf_path not in hashes:
+                if not os.path.exists(pdf_path):
+                    raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+                hashes[pdf_path] = file_sha256(pdf_path)
+        return hashes
+    
+    def iter_page_texts(
+        self,
+        pdf_paths: List[str],
+        file_hashes: Optional[Dict[str, str]] = None
+    ) -> Iterator[tuple]:
+        """
+        Extract the pages of multiple PDF files in parallel.
+        
+        With a cache, pages of files seen before are read from it and newly
+        extracted pages are added to it.
+        
+        Args:
+            pdf_paths: List of paths to PDF files
+            file_hashes: Known SHA-256 hashes by path, to avoid hashing again for the cache
+            
+        Yields:
+            (pdf_path, list of page texts) per file, in input order
+        """
+        for pdf_path in pdf_paths:
+            if not os.path.exists(pdf_path):
+                raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        
+        if self.cache is None:
+            yield from self._extract_pages(pdf_paths)
+            return
+        
+        file_hashes = self._file_hashes(pdf_paths, file_hashes)
+        cached_pages = {pdf_path: self.cache.get_pages(file_hashes[pdf_path]) for pdf_path in pdf_paths}
+        extracted = self._extract_pages([pdf_path for pdf_path in pdf_paths if cached_pages[pdf_path] is None])
+        try:
+            for pdf_path in pdf_paths:
+                page_texts = cached_pages[pdf_path]
+                if page_texts is None:
+                    _, page_texts = next(extracted)
+                    self.cache.put_pages(file_hashes[pdf_path], page_texts)
+                yield pdf_path, page_texts
+        finally:
+            extracted.close()
+    
+    def _extract_pages(self, pdf_paths: List[str]) -> Iterator[tuple]:
+        """Extract the pages of existing PDF files with the process pool, in input order"""
+        # Split every file into page ranges
+        tasks = []
+        for pdf_path in pdf_paths:
+            num_pages = len(PdfReader(pdf_path).pages)
+            ranges = [
+                (start, min(start + self.pages_per_task, num_pages))
+                for start in range(0, num_pages, self.pages_per_task)
+            ]
+            tasks.append((pdf_path, ranges))
+        
+        # Not worth starting processes for a single task
+        if self.max_workers <= 1 or sum(len(ranges) for _, ranges in tasks) <= 1:
+            for pdf_path, ranges in tasks:
+                yield pdf_path, [text for start, end in ranges for text in extract_page_range(pdf_path, start, end)]
+            return
+        
+        # Spawn workers: the pool is created from a thread of a multithreaded
+        # server process, and forking a process with live threads can deadlock.
+        # Tasks run pdf_extract_worker.extract_page_range, which imports only pypdf
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        try:
+            # Submit everything up front so workers stay busy while earlier
+            # files are being consumed
+            futures = [
+                (pdf_path, [executor.submit(extract_page_range, pdf_path, start, end) for start, end in ranges])
+                for pdf_path, ranges in tasks
+            ]
+            for pdf_path, range_futures in futures:
+                yield pdf_path, [text for future in range_futures for text in future.result()]
+        finally:
+            # Don't wait for pages nobody will read if the caller stops early
+            executor.shutdown(wait=True, cancel_futures=True)
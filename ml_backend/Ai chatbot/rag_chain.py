@@ -1,11 +1,12 @@
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, AsyncIterator
 from langchain.prompts import ChatPromptTemplate
 from langchain_groq import ChatGroq
 from langchain.schema.runnable import RunnablePassthrough
 from langchain.schema.output_parser import StrOutputParser
 from chatbot_config import (
     get_system_prompt,
+    get_prompt_template,
     CHATBOT_NAME,
     CHATBOT_VERSION,
     CITATION_FORMAT,
@@ -13,6 +14,19 @@ from chatbot_config import (
     ERROR_RESPONSE
 )
 
+class StreamInterrupted(Exception):
+    """The LLM failed after part of a streamed answer had been sent"""
+
+
+def page_label(metadata: Dict[str, Any]) -> str:
+    """Page number or range of a chunk for citations, "N/A" if unknown"""
+    page_start = metadata.get("page_start")
+    if page_start is None:
+        return str(metadata.get("page", "N/A"))
+    page_end = metadata.get("page_end", page_start)
+    return str(page_start) if page_end == page_start else f"{page_start}-{page_end}"
+
+
 class RAGChain:
     """Implements the RAG (Retrieval-Augmented Generation) chain using Groq LLM."""
     
@@ -20,7 +34,8 @@ class RAGChain:
         self, 
         model_name: str = "llama3-70b-8192",
         api_key: str = None,
-        temperature: float = 0.2
+        temperature: float = 0.2,
+        llm=None
     ):
         """
         Initialize the RAG chain with a Groq LLM.
@@ -29,24 +44,29 @@ class RAGChain:
             model_name: Name of the Groq model to use
             api_key: Groq API key
             temperature: Temperature for generation
+            llm: Chat model to use instead of Groq (e.g. a local mock for load tests)
         """
-        if api_key is None:
-            api_key = os.environ.get("GROQ_API_KEY")
-            if not api_key:
-                raise ValueError(
-                    "Groq API key not provided. Please provide it as an argument "
-                    "or set the GROQ_API_KEY environment variable."
-                )
-        
-        # Initialize the Groq LLM
-        self.llm = ChatGroq(
-            model_name=model_name,
-            groq_api_key=api_key,
-            temperature=temperature
-        )
+        if llm is None:
+            if api_key is None:
+                api_key = os.environ.get("GROQ_API_KEY")
+                if not api_key:
+                    raise ValueError(
+                        "Groq API key not provided. Please provide it as an argument "
+                        "or set the GROQ_API_KEY environment variable."
+                    )
+            
+            # Initialize the Groq LLM
+            llm = ChatGroq(
+                model_name=model_name,
+                groq_api_key=api_key,
+                temperature=temperature
+            )
+        self.llm = llm
         
-        # The prompt template is now imported from chatbot_config.py
-        # and applied dynamically in the answer_question method
+        # Build the chain once; context and question are template variables
+        # filled in per call, so document text is never parsed as a template
+        self.prompt = ChatPromptTemplate.from_template(get_prompt_template())
+        self.chain = self.prompt | self.llm | StrOutputParser()
     
     def format_context(self, relevant_docs: List[Dict[str, Any]]) -> str:
         """
@@ -65,7 +85,7 @@ class RAGChain:
         
         for i, doc in enumerate(relevant_docs):
             source = doc["metadata"].get("source", "Unknown")
-            page = doc["metadata"].get("page", "N/A")
+            page = page_label(doc["metadata"])
             text = doc["text"]
             
             citation = CITATION_FORMAT.format(
@@ -77,6 +97,23 @@ class RAGChain:
             
         return "\n".join(context_parts)
     
+    def build_prompt(self, question: str, relevant_docs: List[Dict[str, Any]]) -> str:
+        """
+        Build the complete prompt sent to the LLM for a question.
+        
+        Args:
+            question: User question
+            relevant_docs: List of retrieved documents
+            
+        Returns:
+            Prompt with the chatbot configuration, context and question
+        """
+        return get_system_prompt(self.format_context(relevant_docs), question)
+    
+    def _chain_inputs(self, question: str, relevant_docs: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Template variables for the chain"""
+        return {"context": self.format_context(relevant_docs), "question": question}
+    
     def answer_question(self, question: str, relevant_docs: List[Dict[str, Any]]) -> str:
         """
         Answer a question based on the retrieved documents using the configured chatbot personality.
@@ -92,23 +129,95 @@ class RAGChain:
             if not relevant_docs:
                 return NO_INFORMATION_RESPONSE
                 
-            # Format the context from relevant documents
-            context = self.format_context(relevant_docs)
+            return self.chain.invoke(self._chain_inputs(question, relevant_docs))
             
-            # Get the complete prompt using the chatbot configuration
-            system_prompt = get_system_prompt(context, question)
+        except Exception as e:
+            print(f"Error in RAG chain: {str(e)}")
+            return ERROR_RESPONSE
+    
+    async def aanswer_question(self, question: str, relevant_docs: List[Dict[str, Any]]) -> str:
+        """
+        Answer a question without blocking the event loop while the LLM responds.
+        
+        Args:
+            question: User question
+            relevant_docs: List of retrieved documents
             
-            # Create a prompt template for this specific query
-            prompt = ChatPromptTemplate.from_template(system_prompt)
+        Returns:
+            Answer from the LLM
+        """
+        try:
+            if not relevant_docs:
+                return NO_INFORMATION_RESPONSE
             
-            # Create the chain and invoke it
-            chain = prompt | self.llm | StrOutputParser()
-            return chain.invoke({})
+            return await self.chain.ainvoke(self._chain_inputs(question, relevant_docs))
             
         except Exception as e:
             print(f"Error in RAG chain: {str(e)}")
             return ERROR_RESPONSE
     
+    def stream_answer(self, question: str, relevant_docs: List[Dict[str, Any]]) -> Iterator[str]:
+        """
+        Stream the answer to a question token by token as the LLM generates it.
+        
+        Args:
+            question: User question
+            relevant_docs: List of retrieved documents
+            
+        Yields:
+            Pieces of the answer from the LLM
+            
+        Raises:
+            StreamInterrupted: If the LLM fails after the first piece, so the
+                caller knows the answer is truncated
+        """
+        if not relevant_docs:
+            yield NO_INFORMATION_RESPONSE
+            return
+        
+        started = False
+        try:
+            for token in self.chain.stream(self._chain_inputs(question, relevant_docs)):
+                started = True
+                yield token
+                
+        except Exception as e:
+            print(f"Error in RAG chain: {str(e)}")
+            # Part of an answer has already been sent and must not be taken as complete
+            if started:
+                raise StreamInterrupted(str(e)) from e
+            yield ERROR_RESPONSE
+    
+    async def astream_answer(self, question: str, relevant_docs: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        """
+        Async version of stream_answer.
+        
+        Args:
+            question: User question
+            relevant_docs: List of retrieved documents
+            
+        Yields:
+            Pieces of the answer from the LLM
+            
+        Raises:
+            StreamInterrupted: If the LLM fails after the first piece
+        """
+        if not relevant_docs:
+            yield NO_INFORMATION_RESPONSE
+            return
+        
+        started = False
+        try:
+            async for token in self.chain.astream(self._chain_inputs(question, relevant_docs)):
+                started = True
+                yield token
+                
+        except Exception as e:
+            print(f"Error in RAG chain: {str(e)}")
+            if started:
+                raise StreamInterrupted(str(e)) from e
+            yield ERROR_RESPONSE
+    
     def change_model(self, model_name: str):
         """
         Change the Groq model being used.
@@ -118,6 +227,11 @@ class RAGChain:
         """
         self.llm.model_name = model_name
         
+    @property
+    def model_name(self) -> str:
+        # Chat models other than ChatGroq may not have a model_name
+        return getattr(self.llm, "model_name", type(self.llm).__name__)
+    
     @property
     def chatbot_info(self):
         """
@@ -129,5 +243,5 @@ class RAGChain:
         return {
             "name": CHATBOT_NAME,
             "version": CHATBOT_VERSION,
-            "model": self.llm.model_name
+            "model": self.model_name
         }
@@ -0,0 +1,247 @@
+"""
+Caches for the /api/chat path.
+
+Retrieval results are cached by (kb_id, normalized question, top_k) and LLM
+answers by (kb_id, model, prompt hash). Both use TTLCache: entries expire
+after a fixed time and the least recently used entry is evicted when the
+cache is full.
+
+SemanticCache additionally reuses answers for paraphrased questions: a
+cached answer is returned when the new question's vector is close enough
+to a cached question's and retrieval returned the same chunks.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, Optional
+
+import numpy as np
+from scipy import sparse
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase the question and drop punctuation and extra whitespace"""
+    return " ".join(WORD_PATTERN.findall(question.lower()))
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def chunk_set(relevant_docs: List[Dict[str, Any]]) -> FrozenSet[str]:
+    """Identify a retrieval result by the texts of its chunks, ignoring order"""
+    return frozenset(hashlib.sha1(doc["text"].encode("utf-8")).hexdigest() for doc in relevant_docs)
+
+
+def cosine_similarity(a, b) -> float:
+    """Similarity of two L2-normalized query vectors (sparse rows or dense arrays)"""
+    if sparse.issparse(a):
+        return float(a.multiply(b).sum())
+    return float(np.dot(a, b))
+
+
+def _is_empty(vector) -> bool:
+    if sparse.issparse(vector):
+        return vector.nnz == 0
+    return not np.any(vector)
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries expire after ttl_seconds.
+
+    Keys are tuples whose first element is the knowledge base ID, so all
+    entries for a knowledge base can be dropped when it is rebuilt.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: float = 3600,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        # key -> (expires_at, value), least recently used first
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self.clock() + self.ttl_seconds, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, kb_id: str) -> int:
+        """Drop every entry for a knowledge base, returning how many were dropped"""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == kb_id]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by query similarity.
+
+    Entries are bucketed by (kb_id, model, chunk set), so a lookup only
+    compares the query vector with cached questions that retrieved exactly
+    the same chunks; the most similar one at or above the threshold wins.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 512,
+        threshold: float = 0.75,
+        ttl_seconds: float = 3600,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        # entry id -> (bucket, expires_at, vector, answer), least recently used first
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        # (kb_id, model, chunk set) -> entry ids
+        self._buckets: Dict[tuple, List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, kb_id: str, model: str, vector, chunks: FrozenSet[str]) -> Optional[str]:
+        """Return the answer to the most similar cached question, if similar enough"""
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            if not _is_empty(vector):
+                now = self.clock()
+                for entry_id in list(self._buckets.get((kb_id, model, chunks), ())):
+                    _, expires_at, cached_vector, _ = self._entries[entry_id]
+                    if expires_at <= now:
+                        self._remove(entry_id)
+                        self.expirations += 1
+                        continue
+                    score = cosine_similarity(vector, cached_vector)
+                    if score >= best_score:
+                        best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][3]
+
+    def put(self, kb_id: str, model: str, vector, chunks: FrozenSet[str], answer: str):
+        # A query with no known terms is not similar to anything
+        if self.max_size <= 0 or _is_empty(vector):
+            return
+        with self._lock:
+            bucket = (kb_id, model, chunks)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (bucket, self.clock() + self.ttl_seconds, vector, answer)
+            self._buckets.setdefault(bucket, []).append(entry_id)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, kb_id: str) -> int:
+        """Drop every entry for a knowledge base, returning how many were dropped"""
+        with self._lock:
+            entry_ids = [
+                entry_id
+                for bucket, ids in self._buckets.items() if bucket[0] == kb_id
+                for entry_id in ids
+            ]
+            for entry_id in entry_ids:
+                self._remove(entry_id)
+            return len(entry_ids)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+    def _remove(self, entry_id: int):
+        """Remove an entry and its bucket reference. Caller holds the lock."""
+        bucket = self._entries.pop(entry_id)[0]
+        ids = self._buckets[bucket]
+        ids.remove(entry_id)
+        if not ids:
+            del self._buckets[bucket]
@@ -44,13 +44,23 @@ def set_api_key():
         return {"status": "error", "error": str(e)}
 
 def process_knowledge_base(force_reprocess=False):
-    """Process the knowledge base."""
+    """Process the knowledge base, waiting for the background job to finish."""
     try:
         response = requests.post(
             f"{BASE_URL}/api/process-knowledge-base",
             params={"force_reprocess": force_reprocess}
         )
-        data = response.json()
+        job = response.json()
+        print(f"Process knowledge base job: {job}")
+        
+        # Poll the job until it completes or fails
+        while True:
+            response = requests.get(f"{BASE_URL}{job['status_url']}")
+            data = response.json()
+            if data["status"] in ("completed", "failed"):
+                break
+            print(f"Progress: {data['progress']}")
+            time.sleep(1)
         print(f"Process knowledge base: {data}")
         return data
     except Exception as e:
@@ -91,6 +101,63 @@ def chat(question):
         print(response.text)
         return None
 
+def chat_stream(question):
+    """Stream an answer and check the event order: sources, then tokens, then done."""
+    response = requests.post(
+        f"{BASE_URL}/api/chat/stream",
+        json={"question": question},
+        stream=True
+    )
+    
+    if response.status_code != 200:
+        print(f"Error: {response.status_code}")
+        print(response.text)
+        return None
+    
+    # Collect (event, data) pairs from the Server-Sent Events stream
+    events = []
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((event, json.loads(line[len("data: "):])))
+    
+    names = [name for name, _ in events]
+    assert names[0] == "sources", f"Expected sources first, got {names[:1]}"
+    assert names[-1] == "done", f"Expected done last, got {names[-1:]}"
+    assert len(names) >= 3 and all(name == "token" for name in names[1:-1]), f"Unexpected event order: {names}"
+    assert events[0][1]["session_id"] == events[-1][1]["session_id"]
+    
+    answer = "".join(data["text"] for name, data in events if name == "token")
+    print("\nStreamed Chat Response:")
+    print("-" * 80)
+    print(f"Answer: {answer}")
+    print("-" * 80)
+    print(f"Events: sources, {len(names) - 2} token, done")
+    return answer
+
+def kb_id_validation():
+    """Check that unregistered and path-like KB IDs are rejected without loading anything."""
+    default_kb_id = requests.get(f"{BASE_URL}/api/knowledge-bases").json()["default_kb_id"]
+    before = requests.get(f"{BASE_URL}/api/knowledge-bases/stats").json()
+    
+    kb_ids = ["not-a-registered-kb", f".{default_kb_id}.tmp"]
+    if default_kb_id:
+        kb_ids += [f"../vector_store/{default_kb_id}", f"./{default_kb_id}"]
+    for kb_id in kb_ids:
+        response = requests.post(
+            f"{BASE_URL}/api/chat",
+            json={"question": "hello"},
+            headers={"X-KB-Id": kb_id}
+        )
+        assert response.status_code == 404, f"Expected 404 for KB ID {kb_id!r}, got {response.status_code}"
+    
+    after = requests.get(f"{BASE_URL}/api/knowledge-bases/stats").json()
+    assert after["loads"] == before["loads"], f"Rejected KB IDs were loaded: {after}"
+    assert [kb["kb_id"] for kb in after["resident"]] == [kb["kb_id"] for kb in before["resident"]]
+    print(f"KB ID validation: {len(kb_ids)} invalid IDs rejected, nothing loaded")
+
 def health_check():
     """Test the health endpoint."""
     try:
@@ -113,6 +180,10 @@ def main():
     health = health_check()
     print(f"Health check result: {json.dumps(health, indent=2)}")
     
+    # Invalid knowledge base IDs must not load anything
+    print("\nTesting knowledge base ID validation...")
+    kb_id_validation()
+    
     # Run specific test
     print("\nRunning simple test...")
     simple_test()
@@ -144,6 +215,9 @@ def simple_test():
     else:
         print(f"Error: {response.status_code}")
         print(response.text)
+    
+    # Ask the same question over the streaming endpoint
+    chat_stream(question)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,78 @@
+"""
+Test script for parallel PDF extraction
+
+Builds a small PDF with numbered pages and checks that extracting it through
+the spawned process pool gives the same pages and chunks as extracting it in
+this process.
+"""
+
+import os
+import re
+import tempfile
+
+from pdf_processor import PDFProcessor
+
+NUM_PAGES = 12
+
+def write_test_pdf(path, num_pages):
+    """Write a PDF whose page n reads "page n line ..." on every line."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(num_pages)), num_pages
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    for i in range(num_pages):
+        lines = " ".join(f"(page {i + 1} line {j} folic acid and prenatal vitamins) '" for j in range(20))
+        stream = f"BT /F1 10 Tf 40 800 Td 12 TL {lines} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for n, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{n} 0 obj\n{obj}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    with open(path, "w") as f:
+        f.write(out)
+
+def test_pool_extraction(pdf_path):
+    """Extract through the pool and compare with sequential extraction."""
+    # Three pages per task gives the pool several tasks for one file
+    pooled = PDFProcessor(max_workers=2, pages_per_task=3)
+    sequential = PDFProcessor(max_workers=1)
+
+    pooled_pages = dict(pooled.iter_page_texts([pdf_path]))[pdf_path]
+    sequential_pages = dict(sequential.iter_page_texts([pdf_path]))[pdf_path]
+    assert len(pooled_pages) == NUM_PAGES, f"Expected {NUM_PAGES} pages, got {len(pooled_pages)}"
+    assert pooled_pages == sequential_pages, "Pooled extraction differs from sequential extraction"
+    for n, text in enumerate(pooled_pages, 1):
+        assert f"page {n} line" in text, f"Page {n} is out of order"
+    print(f"Pool extraction: {len(pooled_pages)} pages match sequential extraction")
+
+    documents = pooled.process_multiple_pdfs([pdf_path])
+    assert documents == sequential.process_multiple_pdfs([pdf_path])
+    for doc in documents:
+        pages = {int(n) for n in re.findall(r"page (\d+) line", doc["text"])}
+        metadata = doc["metadata"]
+        assert metadata["page_start"] <= min(pages) and max(pages) <= metadata["page_end"], metadata
+    print(f"Pool chunking: {len(documents)} chunks with correct page ranges")
+
+def main():
+    """Main test function."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "test.pdf")
+        write_test_pdf(pdf_path, NUM_PAGES)
+        test_pool_extraction(pdf_path)
+
+# The pool's workers are spawned and re-import this module
+if __name__ == "__main__":
+    main()
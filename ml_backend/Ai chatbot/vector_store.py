@@ -103,6 +103,20 @@ class VectorStore:
             
         return results
     
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embed a query with the sentence transformer.
+        
+        Args:
+            query: Query text
+            
+        Returns:
+            L2-normalized embedding vector
+        """
+        embedding = self.model.encode([query])[0].astype('float32')
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+    
     def save(self, directory: str):
         """
         Save the vector store to disk.
@@ -5,17 +5,24 @@ from datetime import datetime, timedelta
 import uvicorn
 import os
 from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables (e.g. DATA_STORE_BACKEND) from .env if present
+load_dotenv()
 
 from app.models.schemas import (
     SymptomLog, 
     SymptomHistory, 
     Alert, 
     Recommendation,
-    SymptomLogResponse
+    SymptomLogResponse,
+    SymptomLogBatch,
+    SymptomLogBatchResponse
 )
 from app.services.symptom_service import SymptomService
 from app.services.alert_service import AlertService
 from app.services.recommendation_service import RecommendationService
+from app.utils.data_store import SymptomStore, get_data_store, set_data_store
 
 # Create data directory if it doesn't exist
 data_dir = Path("data")
@@ -37,9 +44,26 @@ app.add_middleware(
 )
 
 # Service instances
-symptom_service = SymptomService()
-alert_service = AlertService()
-recommendation_service = RecommendationService()
+symptom_service: SymptomService = None
+alert_service: AlertService = None
+recommendation_service: RecommendationService = None
+
+
+def init_services(data_store: SymptomStore) -> None:
+    """Build the service instances around a single shared data store.
+    
+    Call this to point the API at a different store (tests, scripts); every
+    service reads and writes through the same in-memory records.
+    """
+    global symptom_service, alert_service, recommendation_service
+    
+    set_data_store(data_store)
+    symptom_service = SymptomService(data_store)
+    alert_service = AlertService(data_store)
+    recommendation_service = RecommendationService(data_store)
+
+
+init_services(get_data_store())
 
 
 @app.get("/")
@@ -74,15 +98,48 @@ async def log_symptom(symptom_data: SymptomLog):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/symptoms/log-batch", response_model=SymptomLogBatchResponse)
+async def log_symptoms_batch(batch: SymptomLogBatch):
+    """Log several symptom entries at once (e.g. a device sync) and get per-item analysis"""
+    try:
+        # Save all symptoms in one write
+        saved_symptoms = symptom_service.save_symptoms(batch.symptoms)
+        
+        # Analyze once per affected user
+        analysis_results = symptom_service.analyze_symptoms(saved_symptoms)
+        
+        # Generate alerts and recommendations, each saved in one write
+        alerts = alert_service.generate_alerts_batch(saved_symptoms, analysis_results)
+        recommendations = recommendation_service.generate_recommendations_batch(saved_symptoms, analysis_results)
+        
+        return {
+            "status": "success",
+            "results": [
+                {
+                    "symptom_id": saved.symptom_id,
+                    "status": "success",
+                    "analysis": analysis,
+                    "alerts": item_alerts,
+                    "recommendations": item_recommendations
+                }
+                for saved, analysis, item_alerts, item_recommendations in zip(
+                    saved_symptoms, analysis_results, alerts, recommendations
+                )
+            ]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/symptoms/history", response_model=List[SymptomHistory])
-async def get_symptom_history(user_id: str, days: Optional[int] = 30):
+async def get_symptom_history(user_id: str, days: Optional[int] = 30, limit: Optional[int] = None):
     """Get symptom history for a user over a specified period"""
     try:
         # Calculate the start date based on the specified number of days
         start_date = datetime.now() - timedelta(days=days)
         
         # Get symptom history from the service
-        history = symptom_service.get_symptom_history(user_id, start_date)
+        history = symptom_service.get_symptom_history(user_id, start_date, limit)
         
         return history
     except Exception as e:
@@ -90,14 +147,14 @@ async def get_symptom_history(user_id: str, days: Optional[int] = 30):
 
 
 @app.get("/api/alerts", response_model=List[Alert])
-async def get_alerts(user_id: str, days: Optional[int] = 7):
+async def get_alerts(user_id: str, days: Optional[int] = 7, limit: Optional[int] = None):
     """Get current health alerts for a user"""
     try:
         # Calculate the start date based on the specified number of days
         start_date = datetime.now() - timedelta(days=days)
         
         # Get alerts from the service
-        alerts = alert_service.get_alerts(user_id, start_date)
+        alerts = alert_service.get_alerts(user_id, start_date, limit)
         
         return alerts
     except Exception as e:
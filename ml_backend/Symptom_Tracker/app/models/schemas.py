@@ -92,3 +92,12 @@ class SymptomLogResponse(BaseModel):
     analysis: Dict[str, Any]
     alerts: List[Alert]
     recommendations: List[Recommendation]
+
+
+class SymptomLogBatch(BaseModel):
+    symptoms: List[SymptomLog] = Field(..., min_length=1, max_length=500)
+
+
+class SymptomLogBatchResponse(BaseModel):
+    status: str
+    results: List[SymptomLogResponse]
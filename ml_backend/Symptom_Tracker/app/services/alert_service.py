@@ -3,15 +3,38 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 
 from app.models.schemas import SymptomLog, Alert, AlertLevel, SymptomType
-from app.utils.data_store import DataStore
+from app.utils.data_store import SymptomStore, get_data_store
 
 
 class AlertService:
-    def __init__(self):
-        self.data_store = DataStore()
+    def __init__(self, data_store: Optional[SymptomStore] = None):
+        # Services share one store so they all see the same records
+        self.data_store = data_store or get_data_store()
     
     def generate_alerts(self, symptom_data: SymptomLog, analysis_result: Dict[str, Any]) -> List[Alert]:
         """Generate alerts based on symptom data and analysis results"""
+        alerts = self._build_alerts(symptom_data, analysis_result)
+        
+        # Save alerts to data store
+        self.data_store.save_alerts(alerts)
+        
+        return alerts
+    
+    def generate_alerts_batch(self, symptoms: List[SymptomLog],
+                              analysis_results: List[Dict[str, Any]]) -> List[List[Alert]]:
+        """Generate alerts for a batch of symptoms, saving them all in one store write"""
+        alerts_per_symptom = [
+            self._build_alerts(symptom_data, analysis_result)
+            for symptom_data, analysis_result in zip(symptoms, analysis_results)
+        ]
+        
+        # Save alerts to data store
+        self.data_store.save_alerts([alert for alerts in alerts_per_symptom for alert in alerts])
+        
+        return alerts_per_symptom
+    
+    def _build_alerts(self, symptom_data: SymptomLog, analysis_result: Dict[str, Any]) -> List[Alert]:
+        """Create (without saving) the alerts for one symptom"""
         alerts = []
         
         # Check if an anomaly was detected
@@ -33,23 +56,12 @@ class AlertService:
             alert = self._create_specific_symptom_alert(symptom_data)
             alerts.append(alert)
         
-        # Save alerts to data store
-        for alert in alerts:
-            self.data_store.save_alert(alert)
-        
         return alerts
     
-    def get_alerts(self, user_id: str, start_date: datetime) -> List[Alert]:
+    def get_alerts(self, user_id: str, start_date: datetime, limit: Optional[int] = None) -> List[Alert]:
         """Get alerts for a user starting from a specific date"""
-        all_alerts = self.data_store.get_alerts_by_user(user_id)
-        
-        # Filter alerts by date
-        filtered_alerts = [a for a in all_alerts if a.timestamp >= start_date]
-        
-        # Sort by timestamp (newest first)
-        filtered_alerts.sort(key=lambda x: x.timestamp, reverse=True)
-        
-        return filtered_alerts
+        # Range query on the store's time index (newest first)
+        return self.data_store.alerts_range(user_id, start=start_date, limit=limit, newest_first=True)
     
     def _create_anomaly_alert(self, symptom_data: SymptomLog, analysis_result: Dict[str, Any]) -> Alert:
         """Create an alert for an anomaly detection"""
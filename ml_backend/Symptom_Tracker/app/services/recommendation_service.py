@@ -3,15 +3,40 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 
 from app.models.schemas import SymptomLog, Recommendation, SymptomType, SymptomSeverity
-from app.utils.data_store import DataStore
+from app.utils.data_store import SymptomStore, get_data_store
 
 
 class RecommendationService:
-    def __init__(self):
-        self.data_store = DataStore()
+    def __init__(self, data_store: Optional[SymptomStore] = None):
+        # Services share one store so they all see the same records
+        self.data_store = data_store or get_data_store()
     
     def generate_recommendations(self, symptom_data: SymptomLog, analysis_result: Dict[str, Any]) -> List[Recommendation]:
         """Generate personalized recommendations based on symptom data and analysis"""
+        recommendations = self._build_recommendations(symptom_data, analysis_result)
+        
+        # Save recommendations to data store
+        self.data_store.save_recommendations(recommendations)
+        
+        return recommendations
+    
+    def generate_recommendations_batch(self, symptoms: List[SymptomLog],
+                                       analysis_results: List[Dict[str, Any]]) -> List[List[Recommendation]]:
+        """Generate recommendations for a batch of symptoms, saving them all in one store write"""
+        recommendations_per_symptom = [
+            self._build_recommendations(symptom_data, analysis_result)
+            for symptom_data, analysis_result in zip(symptoms, analysis_results)
+        ]
+        
+        # Save recommendations to data store
+        self.data_store.save_recommendations(
+            [recommendation for recommendations in recommendations_per_symptom for recommendation in recommendations]
+        )
+        
+        return recommendations_per_symptom
+    
+    def _build_recommendations(self, symptom_data: SymptomLog, analysis_result: Dict[str, Any]) -> List[Recommendation]:
+        """Create (without saving) the recommendations for one symptom"""
         recommendations = []
         
         # Get recommendations based on symptom type
@@ -29,10 +54,6 @@ class RecommendationService:
             trimester_recommendations = self._get_recommendations_by_trimester(symptom_data, trimester)
             recommendations.extend(trimester_recommendations)
         
-        # Save recommendations to data store
-        for recommendation in recommendations:
-            self.data_store.save_recommendation(recommendation)
-        
         return recommendations
     
     def get_recommendations(self, user_id: str) -> List[Recommendation]:
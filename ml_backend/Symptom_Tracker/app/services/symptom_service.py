@@ -1,90 +1,80 @@
+import os
 import uuid
 import numpy as np
 import pandas as pd
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
 
 from app.models.schemas import SymptomLog, SymptomHistory, SymptomType, SymptomSeverity
-from app.utils.data_store import DataStore
+from app.utils.anomaly_model import AnomalyModel, RunningScaler
+from app.utils.data_store import SymptomStore, get_data_store
+from app.utils.features import FeatureMatrixCache, extract_features
+from app.utils.model_cache import ModelCache
+from app.utils.model_trainer import BackgroundTrainer
+
+# Retrain a user's anomaly model every this many new symptoms
+RETRAIN_INTERVAL = 10
 
 
 class SymptomService:
-    def __init__(self):
-        self.data_store = DataStore()
-        self.anomaly_detector = IsolationForest(contamination=0.05, random_state=42)
-        self.scaler = StandardScaler()
-        self.is_model_trained = False
+    def __init__(self, data_store: Optional[SymptomStore] = None, model_cache: Optional[ModelCache] = None):
+        # Services share one store so they all see the same records
+        self.data_store = data_store or get_data_store()
         
-    def save_symptom(self, symptom_data: SymptomLog) -> SymptomHistory:
-        """Save symptom data and return a SymptomHistory object"""
-        # Generate a unique ID for the symptom log
-        symptom_id = str(uuid.uuid4())
+        # Per-user feature matrices, extended by one row per saved symptom
+        self.feature_cache = FeatureMatrixCache(max_users=int(os.environ.get("FEATURE_CACHE_SIZE", 1024)))
         
-        # Create a SymptomHistory object
-        symptom_history = SymptomHistory(
-            symptom_id=symptom_id,
-            user_id=symptom_data.user_id,
-            symptom_type=symptom_data.symptom_type,
-            severity=symptom_data.severity,
-            timestamp=symptom_data.timestamp,
-            description=symptom_data.description,
-            duration_minutes=symptom_data.duration_minutes,
-            additional_data=symptom_data.additional_data,
-            pregnancy_week=symptom_data.pregnancy_week,
-            analysis_result=None  # Will be updated after analysis
+        # Fitted per-user anomaly models (frozen scaler + isolation forest)
+        self.model_cache = model_cache or ModelCache(
+            max_size=int(os.environ.get("MODEL_CACHE_SIZE", 256)),
+            cache_dir=os.environ.get("MODEL_CACHE_DIR")
         )
         
+        # Models are retrained in the background; requests score against the last good one
+        self.trainer = BackgroundTrainer(
+            train_fn=self._train_anomaly_detector,
+            on_trained=self.model_cache.put,
+            max_workers=int(os.environ.get("MODEL_TRAINING_WORKERS", 2)),
+            debounce_seconds=float(os.environ.get("MODEL_RETRAIN_DEBOUNCE_SECONDS", 1.0))
+        )
+        
+    def save_symptom(self, symptom_data: SymptomLog) -> SymptomHistory:
+        """Save symptom data and return a SymptomHistory object"""
+        return self.save_symptoms([symptom_data])[0]
+    
+    def save_symptoms(self, symptom_logs: List[SymptomLog]) -> List[SymptomHistory]:
+        """Save several symptoms with a single store write and return their SymptomHistory objects"""
+        symptom_histories = [self._to_history(symptom_data) for symptom_data in symptom_logs]
+        
         # Save to data store
-        self.data_store.save_symptom(symptom_history)
+        self.data_store.save_symptoms(symptom_histories)
+        for symptom_history in symptom_histories:
+            self.feature_cache.append(symptom_history.user_id, symptom_history)
         
-        return symptom_history
+        return symptom_histories
     
     def analyze_symptom(self, symptom_data: SymptomLog) -> Dict[str, Any]:
         """Analyze symptom data using ML algorithms"""
         # Get user's symptom history
         history = self.data_store.get_symptoms_by_user(symptom_data.user_id)
         
-        # Prepare analysis result
-        analysis_result = {
-            "anomaly_detected": False,
-            "risk_level": "low",
-            "trend": "stable",
-            "similar_patterns": [],
-            "confidence": 0.0
-        }
-        
         # If we have enough data, perform anomaly detection
+        model = None
         if len(history) >= 5:
-            # Extract features from symptom history
-            features = self._extract_features(history + [symptom_data])
-            
-            # Train the model if not already trained
-            if not self.is_model_trained or len(history) % 10 == 0:  # Retrain every 10 new symptoms
-                self._train_anomaly_detector(features[:-1])  # Train on all but the latest data point
+            # Extract features: cached rows for the history
+            history_features, scaler = self.feature_cache.get(symptom_data.user_id, history)
             
+            # Get this user's last trained model (retraining is scheduled in the background)
+            model = self._get_user_model(symptom_data.user_id, history_features, scaler)
+        
+        if model is not None:
             # Predict anomaly for the new symptom
-            latest_features = features[-1:]
-            anomaly_score = self._predict_anomaly(latest_features)
-            
-            # Update analysis result
-            analysis_result["anomaly_detected"] = bool(anomaly_score < -0.5)  # Convert numpy.bool_ to Python bool
-            analysis_result["confidence"] = float(min(1.0, abs(anomaly_score) * 2))  # Convert to Python float
-            
-            # Determine risk level based on anomaly score and symptom severity
-            risk_level = self._determine_risk_level(anomaly_score, symptom_data)
-            analysis_result["risk_level"] = risk_level
+            anomaly_score = self._predict_anomaly(model, self._extract_features([symptom_data]))
             
-            # Analyze trend based on recent symptoms of the same type
-            trend = self._analyze_trend(history, symptom_data)
-            analysis_result["trend"] = trend
-            
-            # Find similar patterns in the past
-            similar_patterns = self._find_similar_patterns(history, symptom_data)
-            analysis_result["similar_patterns"] = similar_patterns
+            analysis_result = self._ml_analysis(symptom_data, history, anomaly_score)
         else:
-            # Not enough data for ML analysis, use rule-based approach
+            # Not enough data for ML analysis, or the user's first model is still
+            # being trained: use rule-based approach
             analysis_result = self._rule_based_analysis(symptom_data)
         
         # Ensure all values are Python native types, not NumPy types
@@ -92,70 +82,121 @@ class SymptomService:
         
         return analysis_result
     
-    def get_symptom_history(self, user_id: str, start_date: datetime) -> List[SymptomHistory]:
+    def analyze_symptoms(self, saved_symptoms: List[SymptomHistory]) -> List[Dict[str, Any]]:
+        """Analyze a batch of saved symptoms, loading history and scoring once per user.
+        
+        Each symptom is analyzed against the user's history up to and including
+        itself, as if the batch had been logged one symptom at a time.
+        """
+        analysis_results: List[Optional[Dict[str, Any]]] = [None] * len(saved_symptoms)
+        
+        # Group the batch by user, keeping each item's position
+        batch_by_user: Dict[str, List] = {}
+        for position, symptom in enumerate(saved_symptoms):
+            batch_by_user.setdefault(symptom.user_id, []).append((position, symptom))
+        
+        for user_id, items in batch_by_user.items():
+            # Get user's symptom history (already includes this batch)
+            history = self.data_store.get_symptoms_by_user(user_id)
+            batch_ids = {symptom.symptom_id for _, symptom in items}
+            earlier_history = [s for s in history if s.symptom_id not in batch_ids]
+            
+            # Score the whole batch for this user in one call
+            anomaly_scores = None
+            if len(history) >= 5:
+                history_features, scaler = self.feature_cache.get(user_id, history)
+                model = self._get_user_model(user_id, history_features, scaler)
+                if model is not None:
+                    anomaly_scores = model.score_samples(self._extract_features([s for _, s in items]))
+            
+            for k, (position, symptom) in enumerate(items):
+                item_history = earlier_history + [s for _, s in items[:k + 1]]
+                if anomaly_scores is not None and len(item_history) >= 5:
+                    analysis_result = self._ml_analysis(symptom, item_history, float(anomaly_scores[k]))
+                else:
+                    # Not enough data for ML analysis, or the user's first model is
+                    # still being trained: use rule-based approach
+                    analysis_result = self._rule_based_analysis(symptom)
+                analysis_results[position] = self._convert_numpy_types(analysis_result)
+        
+        return analysis_results
+    
+    def get_symptom_history(self, user_id: str, start_date: datetime, limit: Optional[int] = None) -> List[SymptomHistory]:
         """Get symptom history for a user starting from a specific date"""
-        all_symptoms = self.data_store.get_symptoms_by_user(user_id)
-        
-        # Filter symptoms by date
-        filtered_symptoms = [s for s in all_symptoms if s.timestamp >= start_date]
-        
-        return filtered_symptoms
+        # Range query on the store's time index (oldest first)
+        return self.data_store.symptoms_range(user_id, start=start_date, limit=limit)
     
-    def _extract_features(self, symptoms: List) -> np.ndarray:
-        """Extract numerical features from symptom data for ML analysis"""
-        features = []
+    def _to_history(self, symptom_data: SymptomLog) -> SymptomHistory:
+        """Create a SymptomHistory object with a new unique ID for a symptom log"""
+        return SymptomHistory(
+            symptom_id=str(uuid.uuid4()),
+            user_id=symptom_data.user_id,
+            symptom_type=symptom_data.symptom_type,
+            severity=symptom_data.severity,
+            timestamp=symptom_data.timestamp,
+            description=symptom_data.description,
+            duration_minutes=symptom_data.duration_minutes,
+            additional_data=symptom_data.additional_data,
+            pregnancy_week=symptom_data.pregnancy_week,
+            analysis_result=None  # Will be updated after analysis
+        )
+    
+    def _ml_analysis(self, symptom_data: SymptomLog, history: List[SymptomHistory],
+                     anomaly_score: float) -> Dict[str, Any]:
+        """Build the ML analysis result for a symptom from its anomaly score and history"""
+        analysis_result = {
+            "anomaly_detected": bool(anomaly_score < -0.5),  # Convert numpy.bool_ to Python bool
+            "risk_level": "low",
+            "trend": "stable",
+            "similar_patterns": [],
+            "confidence": float(min(1.0, abs(anomaly_score) * 2))  # Convert to Python float
+        }
         
-        for symptom in symptoms:
-            # Convert severity to numerical value
-            severity_value = {
-                SymptomSeverity.MILD: 1,
-                SymptomSeverity.MODERATE: 2,
-                SymptomSeverity.SEVERE: 3
-            }.get(symptom.severity, 0)
-            
-            # Create feature vector
-            feature_vector = [
-                severity_value,
-                symptom.duration_minutes if symptom.duration_minutes else 0,
-                symptom.pregnancy_week if symptom.pregnancy_week else 0,
-                # One-hot encoding of symptom type
-                1 if symptom.symptom_type == SymptomType.NAUSEA else 0,
-                1 if symptom.symptom_type == SymptomType.FATIGUE else 0,
-                1 if symptom.symptom_type == SymptomType.BACK_PAIN else 0,
-                1 if symptom.symptom_type == SymptomType.SWELLING else 0,
-                1 if symptom.symptom_type == SymptomType.HEADACHE else 0,
-                1 if symptom.symptom_type == SymptomType.BLOOD_PRESSURE else 0,
-                1 if symptom.symptom_type == SymptomType.WEIGHT_CHANGE else 0,
-                1 if symptom.symptom_type == SymptomType.SLEEP_ISSUE else 0,
-                1 if symptom.symptom_type == SymptomType.MOOD_CHANGE else 0,
-                1 if symptom.symptom_type == SymptomType.CONTRACTIONS else 0,
-                1 if symptom.symptom_type == SymptomType.FETAL_MOVEMENT else 0,
-                1 if symptom.symptom_type == SymptomType.OTHER else 0,
-            ]
-            
-            features.append(feature_vector)
+        # Determine risk level based on anomaly score and symptom severity
+        analysis_result["risk_level"] = self._determine_risk_level(anomaly_score, symptom_data)
         
-        # Convert to numpy array
-        features_array = np.array(features)
+        # Analyze trend based on recent symptoms of the same type
+        analysis_result["trend"] = self._analyze_trend(history, symptom_data)
         
-        # Scale features
-        if len(features_array) > 1:  # Only scale if we have more than one data point
-            features_array = self.scaler.fit_transform(features_array)
+        # Find similar patterns in the past
+        analysis_result["similar_patterns"] = self._find_similar_patterns(history, symptom_data)
         
-        return features_array
+        return analysis_result
+    
+    def _extract_features(self, symptoms: List) -> np.ndarray:
+        """Extract numerical features from symptom data for ML analysis"""
+        # Severity, duration, pregnancy week and a one-hot symptom type block
+        # (scaling uses the running statistics stored with each user's model)
+        return extract_features(symptoms)
+    
+    def _get_user_model(self, user_id: str, history_features: np.ndarray,
+                        scaler: RunningScaler) -> Optional[AnomalyModel]:
+        """Return the user's last trained model, scheduling a retrain once per RETRAIN_INTERVAL symptoms.
+        
+        Returns None on a model cache miss (the user's first model has not been
+        trained yet); callers must then use rule-based analysis rather than
+        scoring with a default.
+        """
+        version = len(history_features) // RETRAIN_INTERVAL
+        
+        cached = self.model_cache.get(user_id)
+        if cached is None or cached[0] != version:
+            # The scaler snapshot is versioned together with the model trained on it
+            self.trainer.schedule(user_id, version, (history_features, scaler))
+        
+        return cached[1] if cached is not None else None
     
-    def _train_anomaly_detector(self, features: np.ndarray) -> None:
-        """Train the anomaly detection model"""
-        if len(features) > 0:
-            self.anomaly_detector.fit(features)
-            self.is_model_trained = True
+    def _train_anomaly_detector(self, training_data) -> Optional[AnomalyModel]:
+        """Train an isolation forest on one user's features, scaled with their running statistics"""
+        features, scaler = training_data
+        if len(features) == 0:
+            return None
+        return AnomalyModel(scaler).fit(features)
     
-    def _predict_anomaly(self, features: np.ndarray) -> float:
+    def _predict_anomaly(self, model: AnomalyModel, features: np.ndarray) -> float:
         """Predict anomaly score for new symptom data"""
-        if self.is_model_trained:
-            # Get anomaly score (-1 to 1, where lower values indicate anomalies)
-            return float(self.anomaly_detector.score_samples(features)[0])  # Convert to Python float
-        return 0.0
+        # Get anomaly score (-1 to 1, where lower values indicate anomalies)
+        return float(model.score_samples(features)[0])  # Convert to Python float
     
     def _determine_risk_level(self, anomaly_score: float, symptom_data: SymptomLog) -> str:
         """Determine risk level based on anomaly score and symptom severity"""
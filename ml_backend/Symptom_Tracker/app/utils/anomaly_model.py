@@ -0,0 +1,70 @@
+import copy
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+
+class RunningScaler:
+    """Standard scaler whose mean/variance are updated one row at a time.
+
+    Uses Welford's algorithm (Chan et al. for batches), so adding a symptom
+    costs O(1) instead of refitting over the whole history.
+    """
+
+    def __init__(self, num_features: int):
+        self.count = 0
+        self.mean = np.zeros(num_features)
+        self.m2 = np.zeros(num_features)
+
+    def update(self, row: np.ndarray) -> None:
+        """Add one feature row to the running statistics"""
+        self.count += 1
+        delta = row - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (row - self.mean)
+
+    def update_batch(self, rows: np.ndarray) -> None:
+        """Merge a block of feature rows into the running statistics"""
+        if len(rows) == 0:
+            return
+        batch_count = len(rows)
+        batch_mean = rows.mean(axis=0)
+        batch_m2 = ((rows - batch_mean) ** 2).sum(axis=0)
+
+        total = self.count + batch_count
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * batch_count / total
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * self.count * batch_count / total
+        self.count = total
+
+    @property
+    def scale(self) -> np.ndarray:
+        """Population standard deviation, with zero-variance features left unscaled"""
+        if self.count == 0:
+            return np.ones_like(self.mean)
+        std = np.sqrt(self.m2 / self.count)
+        std[std == 0.0] = 1.0
+        return std
+
+    def transform(self, features: np.ndarray) -> np.ndarray:
+        return (features - self.mean) / self.scale
+
+    def snapshot(self) -> "RunningScaler":
+        """Frozen copy to pair with a model trained on the current statistics"""
+        return copy.deepcopy(self)
+
+
+class AnomalyModel:
+    """A user's isolation forest together with the scaler it was trained with"""
+
+    def __init__(self, scaler: RunningScaler):
+        self.scaler = scaler
+        self.detector = IsolationForest(contamination=0.05, random_state=42)
+
+    def fit(self, features: np.ndarray) -> "AnomalyModel":
+        self.detector.fit(self.scaler.transform(features))
+        return self
+
+    def score_samples(self, features: np.ndarray) -> np.ndarray:
+        # Scale with the training-time statistics so scores stay consistent
+        return self.detector.score_samples(self.scaler.transform(features))
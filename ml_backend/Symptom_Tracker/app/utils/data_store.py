@@ -1,23 +1,34 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Protocol, Tuple
 from datetime import datetime
 import json
 import os
+import threading
 from pathlib import Path
 
+from pydantic import BaseModel
+
 from app.models.schemas import SymptomHistory, Alert, Recommendation, SymptomType, SymptomSeverity, AlertLevel
+from app.utils.record_log import RecordLog
+from app.utils.sqlite_store import SQLiteDataStore
+from app.utils.time_index import TimeIndex, timestamp_key
 
 
 class DataStore:
-    """A simple in-memory and file-based data store for the application"""
+    """A simple in-memory and file-based data store for the application.
+    
+    Records are parsed into model instances once, when they are loaded or
+    saved, and the getters hand out those cached instances. Callers must
+    treat returned models as read-only.
+    """
     
-    def __init__(self):
-        # In-memory storage
+    def __init__(self, data_dir: str = "data", compact_threshold: int = 1000):
+        # In-memory storage (user_id -> record_id -> model)
         self.symptoms = {}
         self.alerts = {}
         self.recommendations = {}
         
         # File paths for persistence
-        self.data_dir = Path("data")
+        self.data_dir = Path(data_dir)
         self.symptoms_file = self.data_dir / "symptoms.json"
         self.alerts_file = self.data_dir / "alerts.json"
         self.recommendations_file = self.data_dir / "recommendations.json"
@@ -25,189 +36,370 @@ class DataStore:
         # Create data directory if it doesn't exist
         self.data_dir.mkdir(exist_ok=True)
         
+        # Inserts are appended to a per-collection log and periodically
+        # compacted into the JSON snapshot files above
+        self._lock = threading.RLock()
+        self.symptoms_log = RecordLog(self.symptoms_file, self._json_serializer, self._lock, compact_threshold)
+        self.alerts_log = RecordLog(self.alerts_file, self._json_serializer, self._lock, compact_threshold)
+        self.recommendations_log = RecordLog(
+            self.recommendations_file, self._json_serializer, self._lock, compact_threshold
+        )
+        
+        # Logs whose collection loaded completely; only these may be compacted,
+        # since a snapshot of partial data would drop the records that failed
+        self._loaded_ok = {}
+        
+        # Timestamp-sorted per-user indexes for range queries
+        self.symptom_index = TimeIndex()
+        self.alert_index = TimeIndex()
+        
         # Load data from files if they exist
         self._load_data()
     
     def save_symptom(self, symptom: SymptomHistory) -> None:
         """Save a symptom to the data store"""
-        user_id = symptom.user_id
-        symptom_id = symptom.symptom_id
-        
-        # Initialize user's symptom list if it doesn't exist
-        if user_id not in self.symptoms:
-            self.symptoms[user_id] = {}
-        
-        # Convert to dict for storage
-        symptom_dict = symptom.dict()
-        
-        # Convert enum values to strings for JSON serialization
-        symptom_dict["symptom_type"] = str(symptom_dict["symptom_type"])
-        symptom_dict["severity"] = str(symptom_dict["severity"])
-        
-        # Store by ID
-        self.symptoms[user_id][symptom_id] = symptom_dict
+        self.save_symptoms([symptom])
+    
+    def save_symptoms(self, symptoms: List[SymptomHistory]) -> None:
+        """Save several symptoms with a single log write"""
+        # Convert to dicts for the log
+        entries = [(s.user_id, s.symptom_id, self._to_record(s)) for s in symptoms]
         
-        # Save to file
-        self._save_symptoms()
+        with self._lock:
+            for symptom in symptoms:
+                user_id = symptom.user_id
+                symptom_id = symptom.symptom_id
+                
+                # Initialize user's symptom list if it doesn't exist
+                if user_id not in self.symptoms:
+                    self.symptoms[user_id] = {}
+                
+                # Store by ID, replacing any previous version in the index
+                previous = self.symptoms[user_id].get(symptom_id)
+                if previous is not None:
+                    self.symptom_index.remove(user_id, previous.timestamp, symptom_id)
+                self.symptoms[user_id][symptom_id] = symptom
+                self.symptom_index.add(user_id, symptom.timestamp, symptom_id)
+            
+            # Append to the log
+            self._append(self.symptoms_log, self.symptoms, entries)
     
     def get_symptoms_by_user(self, user_id: str) -> List[SymptomHistory]:
-        """Get all symptoms for a user"""
-        if user_id not in self.symptoms:
-            return []
-        
-        # Convert dict to SymptomHistory objects
-        symptoms = []
-        for symptom_dict in self.symptoms[user_id].values():
-            # Convert timestamp string back to datetime if needed
-            if isinstance(symptom_dict["timestamp"], str):
-                symptom_dict["timestamp"] = datetime.fromisoformat(symptom_dict["timestamp"])
-            
-            # Convert string values back to enums
-            if isinstance(symptom_dict["symptom_type"], str):
-                symptom_type_str = symptom_dict["symptom_type"].split('.')[-1].lower()
-                symptom_dict["symptom_type"] = getattr(SymptomType, symptom_type_str.upper())
-            
-            if isinstance(symptom_dict["severity"], str):
-                severity_str = symptom_dict["severity"].split('.')[-1].lower()
-                symptom_dict["severity"] = getattr(SymptomSeverity, severity_str.upper())
-            
-            symptoms.append(SymptomHistory(**symptom_dict))
-        
-        # Sort by timestamp (oldest first)
-        symptoms.sort(key=lambda x: x.timestamp)
-        
-        return symptoms
+        """Get all symptoms for a user (oldest first)"""
+        return self.symptoms_range(user_id)
+    
+    def symptoms_range(
+        self,
+        user_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[SymptomHistory]:
+        """Get a user's symptoms with start <= timestamp <= end, oldest first by default"""
+        with self._lock:
+            symptom_ids = self.symptom_index.range(user_id, start, end, limit, newest_first)
+            records = self.symptoms.get(user_id, {})
+            return [records[symptom_id] for symptom_id in symptom_ids]
     
     def save_alert(self, alert: Alert) -> None:
         """Save an alert to the data store"""
-        user_id = alert.user_id
-        alert_id = alert.alert_id
-        
-        # Initialize user's alert list if it doesn't exist
-        if user_id not in self.alerts:
-            self.alerts[user_id] = {}
-        
-        # Convert to dict for storage
-        alert_dict = alert.dict()
-        
-        # Convert enum values to strings for JSON serialization
-        alert_dict["level"] = str(alert_dict["level"])
-        
-        # Store by ID
-        self.alerts[user_id][alert_id] = alert_dict
+        self.save_alerts([alert])
+    
+    def save_alerts(self, alerts: List[Alert]) -> None:
+        """Save several alerts with a single log write"""
+        # Convert to dicts for the log
+        entries = [(a.user_id, a.alert_id, self._to_record(a)) for a in alerts]
         
-        # Save to file
-        self._save_alerts()
+        with self._lock:
+            for alert in alerts:
+                user_id = alert.user_id
+                alert_id = alert.alert_id
+                
+                # Initialize user's alert list if it doesn't exist
+                if user_id not in self.alerts:
+                    self.alerts[user_id] = {}
+                
+                # Store by ID, replacing any previous version in the index
+                previous = self.alerts[user_id].get(alert_id)
+                if previous is not None:
+                    self.alert_index.remove(user_id, previous.timestamp, alert_id)
+                self.alerts[user_id][alert_id] = alert
+                self.alert_index.add(user_id, alert.timestamp, alert_id)
+            
+            # Append to the log
+            self._append(self.alerts_log, self.alerts, entries)
     
     def get_alerts_by_user(self, user_id: str) -> List[Alert]:
-        """Get all alerts for a user"""
-        if user_id not in self.alerts:
-            return []
-        
-        # Convert dict to Alert objects
-        alerts = []
-        for alert_dict in self.alerts[user_id].values():
-            # Convert timestamp string back to datetime if needed
-            if isinstance(alert_dict["timestamp"], str):
-                alert_dict["timestamp"] = datetime.fromisoformat(alert_dict["timestamp"])
-            
-            # Convert string values back to enums
-            if isinstance(alert_dict["level"], str):
-                level_str = alert_dict["level"].split('.')[-1].lower()
-                alert_dict["level"] = getattr(AlertLevel, level_str.upper())
-            
-            alerts.append(Alert(**alert_dict))
-        
-        return alerts
+        """Get all alerts for a user (oldest first)"""
+        return self.alerts_range(user_id)
+    
+    def alerts_range(
+        self,
+        user_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[Alert]:
+        """Get a user's alerts with start <= timestamp <= end, oldest first by default"""
+        with self._lock:
+            alert_ids = self.alert_index.range(user_id, start, end, limit, newest_first)
+            records = self.alerts.get(user_id, {})
+            return [records[alert_id] for alert_id in alert_ids]
     
     def save_recommendation(self, recommendation: Recommendation) -> None:
         """Save a recommendation to the data store"""
-        user_id = recommendation.user_id
-        recommendation_id = recommendation.recommendation_id
+        self.save_recommendations([recommendation])
+    
+    def save_recommendations(self, recommendations: List[Recommendation]) -> None:
+        """Save several recommendations with a single log write"""
+        # Convert to dicts for the log
+        entries = [(r.user_id, r.recommendation_id, self._to_record(r)) for r in recommendations]
         
-        # Initialize user's recommendation list if it doesn't exist
-        if user_id not in self.recommendations:
-            self.recommendations[user_id] = {}
+        with self._lock:
+            for recommendation in recommendations:
+                # Initialize user's recommendation list if it doesn't exist
+                if recommendation.user_id not in self.recommendations:
+                    self.recommendations[recommendation.user_id] = {}
+                
+                # Store by ID
+                self.recommendations[recommendation.user_id][recommendation.recommendation_id] = recommendation
+            
+            # Append to the log
+            self._append(self.recommendations_log, self.recommendations, entries)
+    
+    def get_recommendations_by_user(self, user_id: str) -> List[Recommendation]:
+        """Get all recommendations for a user"""
+        with self._lock:
+            return list(self.recommendations.get(user_id, {}).values())
+    
+    def _to_symptom(self, symptom_dict: Dict[str, Any]) -> SymptomHistory:
+        """Convert a stored symptom dict back to a SymptomHistory object"""
+        # Convert timestamp string back to datetime if needed
+        if isinstance(symptom_dict["timestamp"], str):
+            symptom_dict["timestamp"] = datetime.fromisoformat(symptom_dict["timestamp"])
         
-        # Convert to dict for storage
-        recommendation_dict = recommendation.dict()
+        # Convert string values back to enums
+        if isinstance(symptom_dict["symptom_type"], str):
+            symptom_type_str = symptom_dict["symptom_type"].split('.')[-1].lower()
+            symptom_dict["symptom_type"] = getattr(SymptomType, symptom_type_str.upper())
         
-        # Store by ID
-        self.recommendations[user_id][recommendation_id] = recommendation_dict
+        if isinstance(symptom_dict["severity"], str):
+            severity_str = symptom_dict["severity"].split('.')[-1].lower()
+            symptom_dict["severity"] = getattr(SymptomSeverity, severity_str.upper())
         
-        # Save to file
-        self._save_recommendations()
+        return SymptomHistory(**symptom_dict)
     
-    def get_recommendations_by_user(self, user_id: str) -> List[Recommendation]:
-        """Get all recommendations for a user"""
-        if user_id not in self.recommendations:
-            return []
-        
-        # Convert dict to Recommendation objects
-        recommendations = []
-        for rec_dict in self.recommendations[user_id].values():
-            # Convert timestamp string back to datetime if needed
-            if isinstance(rec_dict["timestamp"], str):
-                rec_dict["timestamp"] = datetime.fromisoformat(rec_dict["timestamp"])
-            
-            recommendations.append(Recommendation(**rec_dict))
+    def _to_alert(self, alert_dict: Dict[str, Any]) -> Alert:
+        """Convert a stored alert dict back to an Alert object"""
+        # Convert timestamp string back to datetime if needed
+        if isinstance(alert_dict["timestamp"], str):
+            alert_dict["timestamp"] = datetime.fromisoformat(alert_dict["timestamp"])
         
-        return recommendations
+        # Convert string values back to enums
+        if isinstance(alert_dict["level"], str):
+            level_str = alert_dict["level"].split('.')[-1].lower()
+            alert_dict["level"] = getattr(AlertLevel, level_str.upper())
+        
+        return Alert(**alert_dict)
+    
+    def _to_recommendation(self, rec_dict: Dict[str, Any]) -> Recommendation:
+        """Convert a stored recommendation dict back to a Recommendation object"""
+        # Convert timestamp string back to datetime if needed
+        if isinstance(rec_dict["timestamp"], str):
+            rec_dict["timestamp"] = datetime.fromisoformat(rec_dict["timestamp"])
+        
+        return Recommendation(**rec_dict)
+    
+    def _to_record(self, model: BaseModel) -> Dict[str, Any]:
+        """Convert a model to the dict layout used in the data files"""
+        record = model.dict()
+        
+        # Convert enum values to strings for JSON serialization
+        for key, value in record.items():
+            if isinstance(value, (SymptomType, SymptomSeverity, AlertLevel)):
+                record[key] = str(value)
+        
+        return record
+    
+    def compact(self) -> None:
+        """Fold all collection logs into their snapshot files"""
+        for log, data in self._collections():
+            log.compact(data, self._loaded_ok.get(log, False))
+    
+    def close(self) -> None:
+        """Close open log file handles"""
+        with self._lock:
+            for log in (self.symptoms_log, self.alerts_log, self.recommendations_log):
+                log.close()
+    
+    def _collections(self) -> List[Tuple[RecordLog, Dict[str, Dict[str, BaseModel]]]]:
+        return [
+            (self.symptoms_log, self.symptoms),
+            (self.alerts_log, self.alerts),
+            (self.recommendations_log, self.recommendations)
+        ]
     
     def _load_data(self) -> None:
-        """Load data from files"""
+        """Load snapshots from files and replay the logs written since"""
         # Load symptoms
-        if self.symptoms_file.exists():
-            try:
-                with open(self.symptoms_file, "r") as f:
-                    self.symptoms = json.load(f)
-            except Exception as e:
-                print(f"Error loading symptoms data: {e}")
+        self.symptoms, self._loaded_ok[self.symptoms_log] = self._load_collection(
+            self.symptoms_log, self._to_symptom, "symptoms"
+        )
         
         # Load alerts
-        if self.alerts_file.exists():
-            try:
-                with open(self.alerts_file, "r") as f:
-                    self.alerts = json.load(f)
-            except Exception as e:
-                print(f"Error loading alerts data: {e}")
+        self.alerts, self._loaded_ok[self.alerts_log] = self._load_collection(
+            self.alerts_log, self._to_alert, "alerts"
+        )
         
         # Load recommendations
-        if self.recommendations_file.exists():
-            try:
-                with open(self.recommendations_file, "r") as f:
-                    self.recommendations = json.load(f)
-            except Exception as e:
-                print(f"Error loading recommendations data: {e}")
-    
-    def _save_symptoms(self) -> None:
-        """Save symptoms to file"""
-        try:
-            with open(self.symptoms_file, "w") as f:
-                json.dump(self.symptoms, f, default=self._json_serializer)
-        except Exception as e:
-            print(f"Error saving symptoms data: {e}")
+        self.recommendations, self._loaded_ok[self.recommendations_log] = self._load_collection(
+            self.recommendations_log, self._to_recommendation, "recommendations"
+        )
+        
+        # Build the time indexes
+        self._build_index(self.symptom_index, self.symptoms)
+        self._build_index(self.alert_index, self.alerts)
+        
+        # Fold logs left over from a previous run into the snapshots
+        for log, data in self._collections():
+            if log.needs_compaction():
+                log.compact_in_background(data, self._loaded_ok[log])
     
-    def _save_alerts(self) -> None:
-        """Save alerts to file"""
+    def _load_collection(self, log: RecordLog, parse, name: str) -> Tuple[Dict[str, Dict[str, BaseModel]], bool]:
+        """Load and parse one collection, returning (records, whether every record loaded)"""
         try:
-            with open(self.alerts_file, "w") as f:
-                json.dump(self.alerts, f, default=self._json_serializer)
+            data = log.load()
         except Exception as e:
-            print(f"Error saving alerts data: {e}")
+            print(f"Error loading {name} data: {e}")
+            return {}, False
+        return self._parse_records(data, parse, name)
+    
+    def _parse_records(self, data: Dict[str, Dict[str, Any]], parse,
+                       name: str) -> Tuple[Dict[str, Dict[str, BaseModel]], bool]:
+        """Parse loaded record dicts into models, once per record, skipping records that fail"""
+        parsed = {}
+        ok = True
+        for user_id, records in data.items():
+            user_records = {}
+            for record_id, record in records.items():
+                try:
+                    user_records[record_id] = parse(record)
+                except Exception as e:
+                    print(f"Skipping invalid {name} record {record_id} for user {user_id}: {e}")
+                    ok = False
+            if user_records:
+                parsed[user_id] = user_records
+        return parsed, ok
     
-    def _save_recommendations(self) -> None:
-        """Save recommendations to file"""
+    def _build_index(self, index: TimeIndex, data: Dict[str, Dict[str, BaseModel]]) -> None:
+        """Index every loaded record by user and timestamp"""
+        for user_id, records in data.items():
+            # Sort on the normalized key; raw datetimes may mix naive and aware values
+            for record_id, record in sorted(records.items(), key=lambda item: timestamp_key(item[1].timestamp)):
+                index.add(user_id, record.timestamp, record_id)
+    
+    def _append(self, log: RecordLog, data: Dict[str, Dict[str, BaseModel]],
+                entries: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """Append (user_id, record_id, record) entries to a collection log, compacting it once it grows too large"""
+        if not entries:
+            return
         try:
-            with open(self.recommendations_file, "w") as f:
-                json.dump(self.recommendations, f, default=self._json_serializer)
+            log.append(entries)
         except Exception as e:
-            print(f"Error saving recommendations data: {e}")
+            print(f"Error appending to {log.log_file}: {e}")
+            return
+        
+        if log.needs_compaction():
+            log.compact_in_background(data, self._loaded_ok.get(log, False))
     
     def _json_serializer(self, obj):
         """Custom JSON serializer for objects not serializable by default"""
+        if isinstance(obj, BaseModel):
+            return self._to_record(obj)
         if isinstance(obj, datetime):
             return obj.isoformat()
         if isinstance(obj, (SymptomType, SymptomSeverity, AlertLevel)):
             return str(obj)
         raise TypeError(f"Type {type(obj)} not serializable")
+
+
+class SymptomStore(Protocol):
+    """The storage interface services use, implemented by DataStore and SQLiteDataStore"""
+    
+    def save_symptom(self, symptom: SymptomHistory) -> None: ...
+    
+    def save_symptoms(self, symptoms: List[SymptomHistory]) -> None: ...
+    
+    def get_symptoms_by_user(self, user_id: str) -> List[SymptomHistory]: ...
+    
+    def symptoms_range(
+        self,
+        user_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[SymptomHistory]: ...
+    
+    def save_alert(self, alert: Alert) -> None: ...
+    
+    def save_alerts(self, alerts: List[Alert]) -> None: ...
+    
+    def get_alerts_by_user(self, user_id: str) -> List[Alert]: ...
+    
+    def alerts_range(
+        self,
+        user_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[Alert]: ...
+    
+    def save_recommendation(self, recommendation: Recommendation) -> None: ...
+    
+    def save_recommendations(self, recommendations: List[Recommendation]) -> None: ...
+    
+    def get_recommendations_by_user(self, user_id: str) -> List[Recommendation]: ...
+    
+    def compact(self) -> None: ...
+    
+    def close(self) -> None: ...
+
+
+def create_data_store() -> SymptomStore:
+    """Create the storage backend selected by the DATA_STORE_BACKEND setting.
+    
+    "json" (default) keeps records in memory backed by the files in DATA_DIR;
+    "sqlite" stores them in the database at SQLITE_DB_PATH.
+    """
+    backend = os.environ.get("DATA_STORE_BACKEND", "json").lower()
+    if backend == "sqlite":
+        return SQLiteDataStore(os.environ.get("SQLITE_DB_PATH", "data/symptom_tracker.db"))
+    if backend == "json":
+        return DataStore(data_dir=os.environ.get("DATA_DIR", "data"))
+    raise ValueError(f"Unknown DATA_STORE_BACKEND: {backend}")
+
+
+# Process-wide store shared by all services
+_data_store: Optional[SymptomStore] = None
+_data_store_lock = threading.Lock()
+
+
+def get_data_store() -> SymptomStore:
+    """Return the shared data store, creating it on first use"""
+    global _data_store
+    if _data_store is None:
+        with _data_store_lock:
+            if _data_store is None:
+                _data_store = create_data_store()
+    return _data_store
+
+
+def set_data_store(data_store: SymptomStore) -> None:
+    """Replace the shared data store (e.g. to point the app at another data directory)"""
+    global _data_store
+    with _data_store_lock:
+        _data_store = data_store
@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from app.models.schemas import SymptomType, SymptomSeverity
+from app.utils.anomaly_model import RunningScaler
+
+# One-hot column order follows the SymptomType declaration order
+SYMPTOM_TYPES = list(SymptomType)
+SYMPTOM_TYPE_CODES = {symptom_type: code for code, symptom_type in enumerate(SYMPTOM_TYPES)}
+SEVERITY_CODES = {
+    SymptomSeverity.MILD: 1,
+    SymptomSeverity.MODERATE: 2,
+    SymptomSeverity.SEVERE: 3
+}
+
+# severity, duration, pregnancy week, then one column per symptom type
+NUM_FEATURES = 3 + len(SYMPTOM_TYPES)
+
+
+def encode_symptoms(symptoms: Sequence) -> np.ndarray:
+    """Encode symptoms as compact integer columns: severity, duration, week, type code"""
+    severity_codes = SEVERITY_CODES.get
+    type_codes = SYMPTOM_TYPE_CODES.__getitem__
+    rows = [
+        (
+            severity_codes(symptom.severity, 0),
+            symptom.duration_minutes or 0,
+            symptom.pregnancy_week or 0,
+            type_codes(symptom.symptom_type)
+        )
+        for symptom in symptoms
+    ]
+    return np.array(rows, dtype=np.int32).reshape(len(rows), 4)
+
+
+def build_features(columns: np.ndarray) -> np.ndarray:
+    """Build the feature matrix from encoded columns with NumPy indexing"""
+    num_rows = len(columns)
+    features = np.zeros((num_rows, NUM_FEATURES), dtype=float)
+    features[:, :3] = columns[:, :3]
+    features[np.arange(num_rows), 3 + columns[:, 3]] = 1.0
+    return features
+
+
+def extract_features(symptoms: Sequence) -> np.ndarray:
+    """Numerical feature rows for a list of symptoms"""
+    return build_features(encode_symptoms(symptoms))
+
+
+class FeatureMatrixCache:
+    """Per-user feature matrices that grow by appending rows.
+
+    Rows are kept in insertion order, which is all the anomaly model needs.
+    Each matrix carries a RunningScaler over its rows, updated in O(1) per
+    appended row. A cached matrix is only used while its row count matches
+    the user's history length; otherwise it is rebuilt from the history.
+    """
+
+    def __init__(self, max_users: int = 1024):
+        self.max_users = max_users
+        # user_id -> [buffer, row count, scaler]; the buffer doubles when full
+        self._matrices: "OrderedDict[str, List]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append(self, user_id: str, symptom) -> None:
+        """Add the row for a newly saved symptom to the user's matrix, if cached"""
+        row = extract_features([symptom])
+        with self._lock:
+            entry = self._matrices.get(user_id)
+            if entry is None:
+                return
+            buffer, count, scaler = entry
+            if count == len(buffer):
+                grown = np.empty((max(2 * len(buffer), 16), NUM_FEATURES), dtype=float)
+                grown[:count] = buffer[:count]
+                buffer = grown
+            buffer[count] = row[0]
+            scaler.update(row[0])
+            entry[0], entry[1] = buffer, count + 1
+
+    def get(self, user_id: str, history: Sequence) -> Tuple[np.ndarray, RunningScaler]:
+        """Return the feature matrix for ``history`` and a snapshot of its running scaler.
+
+        The cached rows are reused when they are up to date with the history.
+        """
+        with self._lock:
+            entry = self._matrices.get(user_id)
+            if entry is not None and entry[1] == len(history):
+                self._matrices.move_to_end(user_id)
+                # Rows below the count are never rewritten, so a view is safe to share
+                return entry[0][:entry[1]], entry[2].snapshot()
+
+        features = extract_features(history)
+        scaler = RunningScaler(NUM_FEATURES)
+        scaler.update_batch(features)
+        with self._lock:
+            self._matrices[user_id] = [features, len(features), scaler]
+            self._matrices.move_to_end(user_id)
+            while len(self._matrices) > self.max_users:
+                self._matrices.popitem(last=False)
+        return features, scaler.snapshot()
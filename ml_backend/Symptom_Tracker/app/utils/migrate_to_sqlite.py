@@ -0,0 +1,53 @@
+"""
+Import the JSON data files into an SQLite database.
+
+Usage:
+    python -m app.utils.migrate_to_sqlite [--data-dir data] [--db-path data/symptom_tracker.db]
+
+Reads symptoms.json, alerts.json and recommendations.json (plus any
+unreplayed append logs) from the data directory. Records are upserted by
+ID, so running the migration twice is safe.
+"""
+import argparse
+
+from app.utils.data_store import DataStore
+from app.utils.sqlite_store import SQLiteDataStore
+
+
+def migrate(data_dir: str, db_path: str) -> dict:
+    """Copy every record from the JSON store into the SQLite store"""
+    source = DataStore(data_dir=data_dir)
+    target = SQLiteDataStore(db_path)
+
+    symptoms = [s for records in source.symptoms.values() for s in records.values()]
+    alerts = [a for records in source.alerts.values() for a in records.values()]
+    recommendations = [r for records in source.recommendations.values() for r in records.values()]
+
+    target.save_symptoms(symptoms)
+    target.save_alerts(alerts)
+    target.save_recommendations(recommendations)
+    target.compact()
+
+    source.close()
+    target.close()
+
+    return {
+        "symptoms": len(symptoms),
+        "alerts": len(alerts),
+        "recommendations": len(recommendations)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import Symptom Tracker JSON data into SQLite")
+    parser.add_argument("--data-dir", default="data", help="Directory containing the JSON data files")
+    parser.add_argument("--db-path", default="data/symptom_tracker.db", help="SQLite database to write")
+    args = parser.parse_args()
+
+    counts = migrate(args.data_dir, args.db_path)
+    print(f"Imported {counts['symptoms']} symptoms, {counts['alerts']} alerts and "
+          f"{counts['recommendations']} recommendations into {args.db_path}")
+
+
+if __name__ == "__main__":
+    main()
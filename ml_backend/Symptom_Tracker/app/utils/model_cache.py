@@ -0,0 +1,88 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import joblib
+
+
+class ModelCache:
+    """Bounded LRU cache of fitted per-user models.
+
+    Each user has at most one cached model, tagged with the history version
+    it was trained on. When ``cache_dir`` is set, models are also persisted
+    with joblib so they survive restarts and LRU eviction.
+    """
+
+    def __init__(self, max_size: int = 256, cache_dir: Optional[str] = None):
+        self.max_size = max_size
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._models: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[Tuple[int, Any]]:
+        """Return the user's latest (version, model), or None if there is none"""
+        with self._lock:
+            entry = self._models.get(user_id)
+            if entry is not None:
+                self._models.move_to_end(user_id)
+                return entry
+
+        entry = self._load(user_id)
+        if entry is not None:
+            self._remember(user_id, entry)
+        return entry
+
+    def put(self, user_id: str, version: int, model: Any) -> None:
+        """Cache a model trained on the given history version"""
+        entry = (version, model)
+        self._remember(user_id, entry)
+        self._persist(user_id, entry)
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def _remember(self, user_id: str, entry: Tuple[int, Any]) -> None:
+        with self._lock:
+            current = self._models.get(user_id)
+            # Never replace a model with one trained on older history
+            if current is not None and current[0] > entry[0]:
+                return
+            self._models[user_id] = entry
+            self._models.move_to_end(user_id)
+            while len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+
+    def _path(self, user_id: str) -> Path:
+        # Hash user IDs so they are always safe file names
+        digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{digest}.joblib"
+
+    def _load(self, user_id: str) -> Optional[Tuple[int, Any]]:
+        if self.cache_dir is None:
+            return None
+        path = self._path(user_id)
+        if not path.exists():
+            return None
+        try:
+            data = joblib.load(path)
+            return data["version"], data["model"]
+        except Exception as e:
+            print(f"Error loading cached model for {user_id}: {e}")
+            return None
+
+    def _persist(self, user_id: str, entry: Tuple[int, Any]) -> None:
+        if self.cache_dir is None:
+            return
+        path = self._path(user_id)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            joblib.dump({"version": entry[0], "model": entry[1]}, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error persisting model for {user_id}: {e}")
@@ -0,0 +1,76 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Set, Tuple
+
+
+class BackgroundTrainer:
+    """Runs model training off the request path, debounced per key.
+
+    ``schedule`` returns immediately. Requests for the same key that arrive
+    within ``debounce_seconds`` (or while that key is still training) are
+    collapsed, and only the most recent data is trained on. Finished models
+    are handed to ``on_trained(key, version, model)``.
+    """
+
+    def __init__(
+        self,
+        train_fn: Callable[[Any], Any],
+        on_trained: Callable[[Hashable, int, Any], None],
+        max_workers: int = 2,
+        debounce_seconds: float = 1.0
+    ):
+        self.train_fn = train_fn
+        self.on_trained = on_trained
+        self.debounce_seconds = debounce_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-trainer")
+
+        # Latest (version, data) waiting to be trained, per key
+        self._latest: Dict[Hashable, Tuple[int, Any]] = {}
+        # Keys with a timer or training run in flight
+        self._active: Set[Hashable] = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, key: Hashable, version: int, data: Any) -> None:
+        """Request training for ``key`` on ``data``; returns without waiting"""
+        with self._lock:
+            self._latest[key] = (version, data)
+            if key in self._active:
+                return
+            self._active.add(key)
+        self._start_timer(key)
+
+    def is_pending(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._active
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _start_timer(self, key: Hashable) -> None:
+        if self.debounce_seconds <= 0:
+            self._executor.submit(self._run, key)
+            return
+        timer = threading.Timer(self.debounce_seconds, self._executor.submit, args=(self._run, key))
+        timer.daemon = True
+        timer.start()
+
+    def _run(self, key: Hashable) -> None:
+        with self._lock:
+            version, data = self._latest.pop(key)
+
+        try:
+            model = self.train_fn(data)
+            if model is not None:
+                self.on_trained(key, version, model)
+        except Exception as e:
+            print(f"Error training model for {key}: {e}")
+        finally:
+            with self._lock:
+                # Newer data arrived while we were training: go again
+                if key in self._latest:
+                    restart = True
+                else:
+                    self._active.discard(key)
+                    restart = False
+            if restart:
+                self._start_timer(key)
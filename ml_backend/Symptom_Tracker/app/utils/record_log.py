@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class RecordLog:
+    """Append-only JSON Lines log for one collection of the data store.
+
+    Every insert is written as a single line to ``<name>.jsonl`` so saving a
+    record costs O(1) disk I/O. The full collection is kept in the snapshot
+    file ``<name>.json`` (same user -> record_id -> record layout the data
+    store has always used) and is only rewritten when the log is compacted.
+    """
+
+    def __init__(
+        self,
+        snapshot_file: Path,
+        serializer: Callable[[Any], Any],
+        lock: threading.RLock,
+        compact_threshold: int = 1000
+    ):
+        self.snapshot_file = snapshot_file
+        self.log_file = snapshot_file.with_suffix(".jsonl")
+        # Log segment that is being folded into the snapshot
+        self.compacting_file = snapshot_file.with_suffix(".jsonl.compacting")
+        self.serializer = serializer
+        self.compact_threshold = compact_threshold
+        self.entries = 0
+
+        # Shared with the owning store so rotation sees a consistent view
+        self._lock = lock
+        self._handle = None
+        self._compaction_thread: Optional[threading.Thread] = None
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Load the snapshot and replay any log entries written after it"""
+        data = {}
+        if self.snapshot_file.exists():
+            with open(self.snapshot_file, "r") as f:
+                data = json.load(f)
+
+        # A leftover compacting segment means we stopped mid-compaction;
+        # replaying is idempotent because records are keyed by ID
+        for path in (self.compacting_file, self.log_file):
+            if not path.exists():
+                continue
+            with open(path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn write at the tail of the log
+                        print(f"Skipping corrupt entry in {path}")
+                        continue
+                    data.setdefault(entry["user_id"], {})[entry["record_id"]] = entry["record"]
+                    if path == self.log_file:
+                        self.entries += 1
+
+        return data
+
+    def append(self, entries: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """Append (user_id, record_id, record) entries in one write. Caller must hold the store lock."""
+        lines = "".join(
+            json.dumps(
+                {"user_id": user_id, "record_id": record_id, "record": record},
+                default=self.serializer
+            ) + "\n"
+            for user_id, record_id, record in entries
+        )
+        handle = self._get_handle()
+        handle.write(lines)
+        handle.flush()
+        self.entries += len(entries)
+
+    def needs_compaction(self) -> bool:
+        """Whether the log has grown enough to be folded into the snapshot"""
+        return self.entries >= self.compact_threshold and not self.is_compacting()
+
+    def is_compacting(self) -> bool:
+        return self._compaction_thread is not None and self._compaction_thread.is_alive()
+
+    def compact_in_background(self, data: Dict[str, Dict[str, Any]], load_succeeded: bool) -> None:
+        """Start a background thread that snapshots ``data`` and drops the log"""
+        if self.is_compacting() or not load_succeeded:
+            return
+        self._compaction_thread = threading.Thread(
+            target=self.compact, args=(data, load_succeeded), daemon=True
+        )
+        self._compaction_thread.start()
+
+    def compact(self, data: Dict[str, Dict[str, Any]], load_succeeded: bool) -> None:
+        """Write a fresh snapshot of ``data`` and discard the log entries it covers.
+
+        ``load_succeeded`` must be True only if ``data`` holds every record of
+        the collection; otherwise the snapshot would silently drop records that
+        failed to load, so nothing is written and the log is kept.
+        """
+        if not load_succeeded:
+            print(f"Not compacting {self.snapshot_file}: the collection did not load completely")
+            return
+
+        # Rotate the log and copy the collection atomically with respect to
+        # inserts; new appends go to a fresh log while we serialize
+        with self._lock:
+            self.close()
+            if self.log_file.exists():
+                if self.compacting_file.exists():
+                    # Previous compaction failed; keep its entries as well
+                    with open(self.compacting_file, "a") as dst, open(self.log_file, "r") as src:
+                        dst.write(src.read())
+                    self.log_file.unlink()
+                else:
+                    os.replace(self.log_file, self.compacting_file)
+            self.entries = 0
+            snapshot = {user_id: dict(records) for user_id, records in data.items()}
+
+        try:
+            tmp_file = self.snapshot_file.with_suffix(".json.tmp")
+            with open(tmp_file, "w") as f:
+                json.dump(snapshot, f, default=self.serializer)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.snapshot_file)
+            if self.compacting_file.exists():
+                self.compacting_file.unlink()
+        except Exception as e:
+            # The compacting segment is kept and replayed on next load
+            print(f"Error compacting {self.snapshot_file}: {e}")
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def _get_handle(self):
+        if self._handle is None:
+            self._handle = open(self.log_file, "a")
+        return self._handle
@@ -0,0 +1,190 @@
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Sequence, Type
+
+from pydantic import BaseModel
+
+from app.models.schemas import SymptomHistory, Alert, Recommendation
+from app.utils.time_index import timestamp_key
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symptoms (
+    symptom_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    symptom_type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_symptoms_user_time ON symptoms (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_symptoms_user_type ON symptoms (user_id, symptom_type);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    alert_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_user_time ON alerts (user_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS recommendations (
+    recommendation_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recommendations_user_time ON recommendations (user_id, timestamp);
+"""
+
+
+class SQLiteDataStore:
+    """SQLite storage backend with the same interface as DataStore.
+
+    Records live on disk rather than in memory, and WAL mode lets several
+    uvicorn workers read and write the same database concurrently. Each
+    thread gets its own connection.
+    """
+
+    def __init__(self, db_path: str = "data/symptom_tracker.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def save_symptom(self, symptom: SymptomHistory) -> None:
+        """Save a symptom to the data store"""
+        self.save_symptoms([symptom])
+
+    def get_symptoms_by_user(self, user_id: str) -> List[SymptomHistory]:
+        """Get all symptoms for a user (oldest first)"""
+        return self.symptoms_range(user_id)
+
+    def symptoms_range(
+        self,
+        user_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[SymptomHistory]:
+        """Get a user's symptoms with start <= timestamp <= end, oldest first by default"""
+        return self._range("symptoms", SymptomHistory, user_id, start, end, limit, newest_first)
+
+    def save_alert(self, alert: Alert) -> None:
+        """Save an alert to the data store"""
+        self.save_alerts([alert])
+
+    def get_alerts_by_user(self, user_id: str) -> List[Alert]:
+        """Get all alerts for a user (oldest first)"""
+        return self.alerts_range(user_id)
+
+    def alerts_range(
+        self,
+        user_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[Alert]:
+        """Get a user's alerts with start <= timestamp <= end, oldest first by default"""
+        return self._range("alerts", Alert, user_id, start, end, limit, newest_first)
+
+    def save_recommendation(self, recommendation: Recommendation) -> None:
+        """Save a recommendation to the data store"""
+        self.save_recommendations([recommendation])
+
+    def get_recommendations_by_user(self, user_id: str) -> List[Recommendation]:
+        """Get all recommendations for a user"""
+        return self._range("recommendations", Recommendation, user_id)
+
+    def compact(self) -> None:
+        """Checkpoint the write-ahead log into the main database file"""
+        self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self) -> None:
+        """Close this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def save_symptoms(self, symptoms: Sequence[SymptomHistory]) -> None:
+        """Save several symptoms in one transaction"""
+        rows = [
+            (
+                s.symptom_id, s.user_id, s.symptom_type.value, s.severity.value,
+                timestamp_key(s.timestamp), s.json()
+            )
+            for s in symptoms
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO symptoms "
+                "(symptom_id, user_id, symptom_type, severity, timestamp, data) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def save_alerts(self, alerts: Sequence[Alert]) -> None:
+        """Save several alerts in one transaction"""
+        rows = [(a.alert_id, a.user_id, timestamp_key(a.timestamp), a.json()) for a in alerts]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO alerts (alert_id, user_id, timestamp, data) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def save_recommendations(self, recommendations: Sequence[Recommendation]) -> None:
+        """Save several recommendations in one transaction"""
+        rows = [
+            (r.recommendation_id, r.user_id, timestamp_key(r.timestamp), r.json())
+            for r in recommendations
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO recommendations "
+                "(recommendation_id, user_id, timestamp, data) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def _range(
+        self,
+        table: str,
+        model: Type[BaseModel],
+        user_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[BaseModel]:
+        """Query a table on its (user_id, timestamp) index"""
+        query = f"SELECT data FROM {table} WHERE user_id = ?"
+        params = [user_id]
+        if start is not None:
+            query += " AND timestamp >= ?"
+            params.append(timestamp_key(start))
+        if end is not None:
+            query += " AND timestamp <= ?"
+            params.append(timestamp_key(end))
+        query += " ORDER BY timestamp DESC" if newest_first else " ORDER BY timestamp ASC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        rows = self._connect().execute(query, params).fetchall()
+        return [model.parse_raw(row[0]) for row in rows]
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
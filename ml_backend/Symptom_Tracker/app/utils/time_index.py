@@ -0,0 +1,87 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+
+def timestamp_key(timestamp: Union[datetime, str]) -> float:
+    """Convert a stored timestamp (datetime or ISO string) to a sortable key"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp.timestamp()
+
+
+class TimeIndex:
+    """Per-user record IDs kept sorted by timestamp.
+
+    Each user has two parallel arrays: timestamp keys (sorted) and record IDs,
+    so a time-window query is two bisections plus a slice.
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, List[float]] = {}
+        self._ids: Dict[str, List[str]] = {}
+
+    def add(self, user_id: str, timestamp: Union[datetime, str], record_id: str) -> None:
+        """Insert a record ID at its position in the user's timeline"""
+        key = timestamp_key(timestamp)
+        keys = self._keys.setdefault(user_id, [])
+        ids = self._ids.setdefault(user_id, [])
+
+        # Fast path: records almost always arrive in time order
+        if not keys or key >= keys[-1]:
+            keys.append(key)
+            ids.append(record_id)
+            return
+
+        position = bisect_right(keys, key)
+        keys.insert(position, key)
+        ids.insert(position, record_id)
+
+    def remove(self, user_id: str, timestamp: Union[datetime, str], record_id: str) -> None:
+        """Remove a record ID that was indexed with the given timestamp"""
+        keys = self._keys.get(user_id)
+        if not keys:
+            return
+
+        key = timestamp_key(timestamp)
+        ids = self._ids[user_id]
+        position = bisect_left(keys, key)
+        while position < len(keys) and keys[position] == key:
+            if ids[position] == record_id:
+                del keys[position]
+                del ids[position]
+                return
+            position += 1
+
+    def range(
+        self,
+        user_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[str]:
+        """Return record IDs with start <= timestamp <= end.
+
+        Results are oldest first unless ``newest_first`` is set; ``limit`` keeps
+        the first ``limit`` IDs in that order.
+        """
+        keys = self._keys.get(user_id)
+        if not keys:
+            return []
+
+        low = bisect_left(keys, timestamp_key(start)) if start is not None else 0
+        high = bisect_right(keys, timestamp_key(end)) if end is not None else len(keys)
+        ids = self._ids[user_id]
+
+        if newest_first:
+            if limit is not None:
+                low = max(low, high - limit)
+            return ids[low:high][::-1]
+
+        if limit is not None:
+            high = min(high, low + limit)
+        return ids[low:high]
+
+    def count(self, user_id: str) -> int:
+        return len(self._keys.get(user_id, ()))
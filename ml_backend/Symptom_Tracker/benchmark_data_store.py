@@ -0,0 +1,91 @@
+"""
+Benchmark DataStore reads for a user with a large symptom history.
+
+Compares the current store (models parsed once at load) against the old
+read path, which re-parsed timestamps/enums and rebuilt every SymptomHistory
+on each call.
+
+Usage:
+    python benchmark_data_store.py [num_records]
+"""
+import json
+import sys
+import tempfile
+import timeit
+import uuid
+from datetime import datetime, timedelta
+
+from app.models.schemas import SymptomHistory, SymptomType, SymptomSeverity
+from app.utils.data_store import DataStore
+
+USER_ID = "benchmark_user"
+
+
+def legacy_get_symptoms(records):
+    """The pre-caching read path: parse and rebuild every record on each call"""
+    symptoms = []
+    for stored in records.values():
+        symptom_dict = dict(stored)
+        symptom_dict["timestamp"] = datetime.fromisoformat(symptom_dict["timestamp"])
+        symptom_type_str = symptom_dict["symptom_type"].split('.')[-1].lower()
+        symptom_dict["symptom_type"] = getattr(SymptomType, symptom_type_str.upper())
+        severity_str = symptom_dict["severity"].split('.')[-1].lower()
+        symptom_dict["severity"] = getattr(SymptomSeverity, severity_str.upper())
+        symptoms.append(SymptomHistory(**symptom_dict))
+    symptoms.sort(key=lambda x: x.timestamp)
+    return symptoms
+
+
+def main():
+    num_records = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    symptom_types = list(SymptomType)
+    severities = list(SymptomSeverity)
+    start = datetime.now() - timedelta(minutes=num_records)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = DataStore(data_dir=data_dir, compact_threshold=num_records + 1)
+        for i in range(num_records):
+            store.save_symptom(SymptomHistory(
+                symptom_id=str(uuid.uuid4()),
+                user_id=USER_ID,
+                symptom_type=symptom_types[i % len(symptom_types)],
+                severity=severities[i % len(severities)],
+                timestamp=start + timedelta(minutes=i),
+                duration_minutes=i % 120,
+                pregnancy_week=1 + i % 40
+            ))
+        store.compact()
+        store.close()
+
+        # Reload so the timing includes nothing from the insert path
+        loaded = []
+        try:
+            load_time = timeit.timeit(lambda: loaded.append(DataStore(data_dir=data_dir)), number=1)
+        finally:
+            for loaded_store in loaded:
+                loaded_store.close()
+
+        store = DataStore(data_dir=data_dir)
+        try:
+            with open(store.symptoms_file, "r") as f:
+                raw_records = json.load(f)[USER_ID]
+
+            runs = 20
+            legacy = timeit.timeit(lambda: legacy_get_symptoms(raw_records), number=runs) / runs
+            cached = timeit.timeit(lambda: store.get_symptoms_by_user(USER_ID), number=runs) / runs
+            window = timeit.timeit(
+                lambda: store.symptoms_range(USER_ID, start=datetime.now() - timedelta(days=1)), number=runs
+            ) / runs
+        finally:
+            store.close()
+
+    print(f"Records for {USER_ID}: {num_records}")
+    print(f"Load (parse once):              {load_time * 1000:8.2f} ms")
+    print(f"get_symptoms_by_user (legacy):  {legacy * 1000:8.2f} ms/call")
+    print(f"get_symptoms_by_user (cached):  {cached * 1000:8.2f} ms/call")
+    print(f"symptoms_range (last 24h):      {window * 1000:8.2f} ms/call")
+    print(f"Speedup: {legacy / cached:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
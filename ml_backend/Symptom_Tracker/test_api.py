@@ -116,6 +116,45 @@ def log_symptom(symptom_data):
         return None
 
 
+def log_symptoms_batch(symptoms):
+    """Log several symptoms in one request and check the per-item analysis and alerts"""
+    url = f"{BASE_URL}/api/symptoms/log-batch"
+    
+    # Add timestamps if not present
+    for symptom_data in symptoms:
+        if "timestamp" not in symptom_data:
+            symptom_data["timestamp"] = datetime.now().isoformat()
+    
+    response = requests.post(url, json={"symptoms": symptoms})
+    
+    if response.status_code != 200:
+        print(f"Error logging symptom batch: {response.status_code}")
+        print(response.text)
+        return None
+    
+    result = response.json()
+    results = result["results"]
+    print(f"Successfully logged {len(results)} symptoms in one batch")
+    
+    # One result per submitted symptom, in order, each with its own analysis
+    assert result["status"] == "success"
+    assert len(results) == len(symptoms), f"Expected {len(symptoms)} results, got {len(results)}"
+    for symptom_data, item in zip(symptoms, results):
+        assert item["status"] == "success"
+        assert item["symptom_id"]
+        for key in ("anomaly_detected", "risk_level", "trend", "confidence"):
+            assert key in item["analysis"], f"Missing '{key}' in analysis for {symptom_data['symptom_type']}"
+        
+        # Severe symptoms must be flagged and raise an alert
+        if symptom_data["severity"] == "severe":
+            assert item["analysis"]["risk_level"] == "high"
+            assert item["alerts"], f"No alert for severe {symptom_data['symptom_type']}"
+        print(f"  {symptom_data['symptom_type']} ({symptom_data['severity']}): "
+              f"risk {item['analysis']['risk_level']}, {len(item['alerts'])} alerts")
+    
+    return result
+
+
 def get_symptom_history():
     """Get symptom history for the test user"""
     url = f"{BASE_URL}/api/symptoms/history?user_id={USER_ID}"
@@ -178,6 +217,13 @@ def run_test():
         log_symptom(symptom)
         time.sleep(1)  # Small delay between requests
     
+    # Log a batch for a second user, as a device sync would
+    print("\n=== Logging Symptom Batch ===")
+    batch_user_id = f"{USER_ID}_batch"
+    log_symptoms_batch([
+        dict(symptom, user_id=batch_user_id) for symptom in sample_symptoms[:3] + sample_symptoms[-1:]
+    ])
+    
     # # Get symptom history
     # print("\n=== Getting Symptom History ===")
     # get_symptom_history()